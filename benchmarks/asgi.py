@@ -0,0 +1,9 @@
+"""ASGI entry point of the servers started by `benchmarks.load`."""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.load_settings")
+
+application = get_asgi_application()
@@ -0,0 +1,347 @@
+"""
+End-to-end load tests of `apischema` under real servers.
+
+Seeds a SQLite database with users and groups, starts the benchmark project under gunicorn
+(WSGI) and uvicorn (ASGI) for every worker count and combination of the `ApiSettings` that
+change the wrapper, and drives concurrent keep-alive traffic at the list, detail, action and
+`square` endpoints of the sync and async `UserViewSet`-style viewsets. Reports the throughput
+and the p50/p95/p99 latency of each endpoint.
+
+Needs `gunicorn` and `uvicorn` (`uv sync --group bench`).
+
+Usage:
+
+    python -m benchmarks.load --output load.json
+    python -m benchmarks.load --servers asgi --workers 1,4 --matrix default --duration 10
+    python -m benchmarks.load --compare load.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SETTING_TOGGLES = ("TRANSACTION", "SQL_LOGGING", "SHOW_PERMISSIONS")
+DEFAULT_CONFIG = {"TRANSACTION": True, "SQL_LOGGING": False, "SHOW_PERMISSIONS": True}
+KINDS = ("sync", "async")
+ENDPOINTS = {
+    "list": "/api/users-{kind}/",
+    "detail": "/api/users-{kind}/{pk}/",
+    "action": "/api/users-{kind}/{pk}/groups/",
+    "square": "/api/users-{kind}/square/?n=7",
+}
+SERVERS = ("wsgi", "asgi")
+READY_PATH = "/api/users-sync/square/"
+
+
+def _server_command(server: str, port: int, workers: int, threads: int) -> list[str]:
+    if server == "wsgi":
+        return [
+            sys.executable, "-m", "gunicorn", "benchmarks.wsgi:application",
+            "--bind", f"127.0.0.1:{port}",
+            "--workers", str(workers),
+            "--worker-class", "gthread",
+            "--threads", str(threads),
+            "--log-level", "warning",
+        ]  # fmt: skip
+    return [
+        sys.executable, "-m", "uvicorn", "benchmarks.asgi:application",
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(workers),
+        "--no-access-log",
+        "--log-level", "warning",
+    ]  # fmt: skip
+
+
+def seed(users: int, groups: int) -> list[int]:
+    """Create the users and groups, each user in 3 groups, and return the user ids."""
+    from django.contrib.auth.models import Group, User
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        # Readers don't block on the writer, closer to a server database
+        cursor.execute("PRAGMA journal_mode=WAL")
+    Group.objects.bulk_create(Group(name=f"group{i}") for i in range(groups))
+    User.objects.bulk_create(User(username=f"user{i}", email=f"user{i}@example.com") for i in range(users))
+    group_ids = list(Group.objects.values_list("pk", flat=True))
+    user_ids = list(User.objects.values_list("pk", flat=True))
+    Membership = User.groups.through
+    Membership.objects.bulk_create(
+        Membership(user_id=user_id, group_id=group_ids[(i + j) % len(group_ids)])
+        for i, user_id in enumerate(user_ids)
+        for j in range(min(3, len(group_ids)))
+    )
+    return user_ids
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(server: str, workers: int, threads: int, env: dict[str, str], log_dir: Path) -> Iterator[int]:
+    """Start `server` and yield its port once it answers, stop it on exit."""
+    port = _free_port()
+    log_path = log_dir / f"{server}-{port}.log"
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            _server_command(server, port, workers, threads), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log
+        )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{server} exited with {process.returncode}:\n{log_path.read_text()}")
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                connection.request("GET", READY_PATH)
+                if connection.getresponse().status == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{server} didn't answer in 30s:\n{log_path.read_text()}")
+            time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def percentile(quantiles: list[float], p: int) -> float:
+    return round(quantiles[p - 1] * 1000, 3)
+
+
+def drive(port: int, make_path: Callable[[random.Random], str], concurrency: int, duration: float, warmup: float):
+    """Send requests from `concurrency` keep-alive connections, measuring those after `warmup` seconds."""
+    start = time.perf_counter()
+    measure_start = start + warmup
+    end = measure_start + duration
+    latencies: list[list[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(index: int):
+        rng = random.Random(index)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while (sent := time.perf_counter()) < end:
+            try:
+                connection.request("GET", make_path(rng))
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                ok = False
+            if sent < measure_start:
+                continue
+            if ok:
+                latencies[index].append(time.perf_counter() - sent)
+            else:
+                errors[index] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = sorted(itertools.chain.from_iterable(latencies))
+    result: dict[str, float] = {"requests": len(merged), "errors": sum(errors), "rps": round(len(merged) / duration, 1)}
+    if len(merged) >= 2:
+        quantiles = statistics.quantiles(merged, n=100, method="inclusive")
+        result.update(
+            {
+                "mean_ms": round(statistics.fmean(merged) * 1000, 3),
+                "p50_ms": percentile(quantiles, 50),
+                "p95_ms": percentile(quantiles, 95),
+                "p99_ms": percentile(quantiles, 99),
+            }
+        )
+    return result
+
+
+def _make_path(template: str, kind: str, user_ids: list[int]) -> Callable[[random.Random], str]:
+    if "{pk}" not in template:
+        path = template.format(kind=kind)
+        return lambda rng: path
+    return lambda rng: template.format(kind=kind, pk=rng.choice(user_ids))
+
+
+def _configs(matrix: str) -> list[dict[str, bool]]:
+    if matrix == "default":
+        return [DEFAULT_CONFIG]
+    return [
+        dict(zip(SETTING_TOGGLES, values)) for values in itertools.product((False, True), repeat=len(SETTING_TOGGLES))
+    ]
+
+
+def _package_version(name: str) -> str | None:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def run(options: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "load.sqlite3"
+        os.environ["DJANGO_SETTINGS_MODULE"] = "benchmarks.load_settings"
+        os.environ["APISCHEMA_LOAD_DB"] = str(database)
+
+        import django
+
+        django.setup()
+        user_ids = seed(options.users, options.groups)
+
+        pythonpath = [str(ROOT), str(ROOT / "src"), os.environ.get("PYTHONPATH", "")]
+        for config, server, workers in itertools.product(_configs(options.matrix), options.servers, options.workers):
+            env = {
+                **os.environ,
+                "PYTHONPATH": os.pathsep.join(i for i in pythonpath if i),
+                "APISCHEMA_LOAD_SETTINGS": json.dumps(config),
+            }
+            label = ",".join(f"{name}={int(value)}" for name, value in config.items())
+            print(f"{server} workers={workers} {label}", file=sys.stderr)
+            with serve(server, workers, options.threads, env, Path(tmp)) as port:
+                for kind, (endpoint, template) in itertools.product(KINDS, ENDPOINTS.items()):
+                    make_path = _make_path(template, kind, user_ids)
+                    result = drive(port, make_path, options.concurrency, options.duration, options.warmup)
+                    results[f"load.{server}.{kind}.{endpoint}[workers={workers},{label}]"] = result
+
+    return {
+        "version": 1,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "django": _package_version("django"),
+            "djangorestframework": _package_version("djangorestframework"),
+            "drf-apischema": _package_version("drf-apischema"),
+            "gunicorn": _package_version("gunicorn"),
+            "uvicorn": _package_version("uvicorn"),
+            "users": options.users,
+            "concurrency": options.concurrency,
+            "threads": options.threads,
+            "duration": options.duration,
+            "warmup": options.warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """
+    Return the endpoints of `current` with a throughput lower or a p95/p99 higher than `baseline`
+    by over `threshold`.
+    """
+    regressions = []
+    for name, metrics in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric, sign in (("rps", -1), ("p95_ms", 1), ("p99_ms", 1)):
+            if not base.get(metric) or metric not in metrics:
+                continue
+            change = metrics[metric] / base[metric] - 1
+            if change * sign > threshold:
+                regressions.append(
+                    {
+                        "name": name,
+                        "metric": metric,
+                        "baseline": base[metric],
+                        "current": metrics[metric],
+                        "change": round(change, 4),
+                    }
+                )
+    return regressions
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(i) for i in value.split(",") if i]
+
+
+def _server_list(value: str) -> list[str]:
+    servers = [i for i in value.split(",") if i]
+    for server in servers:
+        if server not in SERVERS:
+            raise argparse.ArgumentTypeError(f"unknown server {server!r}, expected {', '.join(SERVERS)}")
+    return servers
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=_server_list, default=list(SERVERS), help="Comma separated: wsgi,asgi")
+    parser.add_argument("--workers", type=_int_list, default=[1, 4], help="Comma separated worker process counts")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker")
+    parser.add_argument(
+        "--matrix",
+        choices=("full", "default"),
+        default="full",
+        help="Every combination of the settings toggles, or the default settings only",
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--duration", type=float, default=5, help="Measured seconds per endpoint")
+    parser.add_argument("--warmup", type=float, default=1, help="Unmeasured seconds per endpoint")
+    parser.add_argument("--users", type=int, default=1000, help="Seeded users")
+    parser.add_argument("--groups", type=int, default=20, help="Seeded groups")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change flagged as regression")
+    options = parser.parse_args(argv)
+
+    report = run(options)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, options.threshold)
+
+    content = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(content)
+    else:
+        print(content)
+
+    for regression in report.get("regressions", []):
+        print(
+            f"REGRESSION {regression['name']} {regression['metric']}: "
+            f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})",
+            file=sys.stderr,
+        )
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Django settings of the servers started by `benchmarks.load`.
+
+The benchmark settings, with the seeded database and the `ApiSettings` of the measured
+configuration taken from the environment. `DEBUG` follows `SQL_LOGGING`: the queries are
+only recorded in `DEBUG`, without it `SQL_LOGGING` would have nothing to log and measure nothing.
+"""
+
+import json
+import os
+
+from .settings import *  # noqa: F403
+
+ALLOWED_HOSTS = ["*"]
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("APISCHEMA_LOAD_DB", ":memory:"),
+        "OPTIONS": {"timeout": 30},
+    }
+}
+
+DRF_APISCHEMA_SETTINGS = json.loads(os.environ.get("APISCHEMA_LOAD_SETTINGS", "{}"))
+
+DEBUG = bool(DRF_APISCHEMA_SETTINGS.get("SQL_LOGGING"))
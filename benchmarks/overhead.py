@@ -0,0 +1,244 @@
+"""
+Micro-benchmarks for the per-request overhead of `apischema`.
+
+Measures wall time and peak allocated bytes for each phase of the wrapper, and for whole
+requests against the synthetic viewsets in `benchmarks.views` for every combination of the
+`ApiSettings` that change the wrapper, comparing sync and async views to bare DRF.
+The phases aren't split by settings, they run with the settings reported in `meta.phase_settings`.
+
+Usage:
+
+    python -m benchmarks.overhead --output bench.json
+    python -m benchmarks.overhead --compare bench.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Callable
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db import transaction as _transaction  # noqa: E402
+from rest_framework.exceptions import ValidationError  # noqa: E402
+from rest_framework.permissions import AllowAny  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from drf_apischema import HttpError  # noqa: E402
+from drf_apischema.core import (  # noqa: E402
+    ArgCollection,
+    _after_request,
+    _check_permissions,
+    _create_event,
+    _handle_exception,
+    _validate_request,
+)
+from drf_apischema.settings import api_settings  # noqa: E402
+
+from .views import SquareQuery, make_viewsets  # noqa: E402
+
+SETTING_TOGGLES = ("TRANSACTION", "SQL_LOGGING", "SHOW_PERMISSIONS")
+ENDPOINTS = {"list": "/api/{kind}/", "square": "/api/{kind}/square/?n=3"}
+
+
+def measure(fn: Callable[[], Any], iterations: int, rounds: int) -> dict[str, float]:
+    """Run `fn` and return its median/min wall time and mean peak allocation per call."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        timings.append((time.perf_counter_ns() - start) / iterations)
+
+    alloc_iterations = max(1, iterations // 10)
+    peaks = 0
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            current, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            peaks += tracemalloc.get_traced_memory()[1] - current
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ns": round(statistics.median(timings), 1),
+        "min_ns": round(min(timings), 1),
+        "bytes": round(peaks / alloc_iterations, 1),
+    }
+
+
+def _make_event():
+    factory = APIRequestFactory()
+    viewset = make_viewsets()["sync"]
+    view = viewset()
+    view.request = Request(factory.get("/api/sync/square/", {"n": 3}))
+    view.args, view.kwargs = (), {}
+    view.format_kwarg = None
+    view.action, view.detail = "square", False
+    return _create_event((view, view.request), {})
+
+
+def bench_phases(iterations: int, rounds: int) -> dict[str, dict[str, float]]:
+    """The phases of the wrapper in isolation, with the current settings."""
+    event = _make_event()
+    view_args = event.args
+    permission_args = ArgCollection(permissions=[AllowAny])
+    query_args = ArgCollection(query=SquareQuery)
+    http_error = HttpError("bench")
+    validation_error = ValidationError({"n": ["bench"]})
+
+    def transaction():
+        with _transaction.atomic():
+            pass
+
+    phases: dict[str, Callable[[], Any]] = {
+        "create_event": lambda: _create_event(view_args, {}),
+        "check_permissions": lambda: _check_permissions(event, permission_args),
+        "validate_request": lambda: _validate_request(event, query_args),
+        "transaction": transaction,
+        "after_request": lambda: _after_request({"result": 9}),
+        "after_request_empty": lambda: _after_request(None),
+        "handle_exception_http_error": lambda: _handle_exception(http_error, event),
+        "handle_exception_validation_error": lambda: _handle_exception(validation_error, event),
+    }
+    return {f"phase.{name}": measure(fn, iterations, rounds) for name, fn in phases.items()}
+
+
+def bench_requests(iterations: int, rounds: int) -> dict[str, dict[str, float]]:
+    factory = APIRequestFactory()
+    results = {}
+    defaults = {name: getattr(api_settings, name) for name in SETTING_TOGGLES}
+    try:
+        for values in itertools.product((False, True), repeat=len(SETTING_TOGGLES)):
+            flags = dict(zip(SETTING_TOGGLES, values))
+            for name, value in flags.items():
+                setattr(api_settings, name, value)
+            # The queries `SQL_LOGGING` logs are only recorded in `DEBUG`
+            connection.force_debug_cursor = flags["SQL_LOGGING"]
+            config = ",".join(f"{name}={int(value)}" for name, value in flags.items())
+
+            for kind, viewset in make_viewsets().items():
+                for action, url in ENDPOINTS.items():
+                    view = viewset.as_view({"get": action})
+                    request = factory.get(url.format(kind=kind))
+                    results[f"request.{kind}.{action}[{config}]"] = measure(lambda: view(request), iterations, rounds)
+    finally:
+        for name, value in defaults.items():
+            setattr(api_settings, name, value)
+        connection.force_debug_cursor = False
+
+    for key in [k for k in results if not k.startswith("request.bare.")]:
+        kind = key.split(".")[1]
+        baseline = results[key.replace(f"request.{kind}.", "request.bare.", 1)]
+        results[key]["overhead_ns"] = round(results[key]["ns"] - baseline["ns"], 1)
+    return results
+
+
+def _package_version(name: str) -> str | None:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def run(iterations: int, rounds: int) -> dict[str, Any]:
+    results: dict[str, dict[str, float]] = {}
+    phase_settings = {name: getattr(api_settings, name) for name in SETTING_TOGGLES}
+    # SQL_LOGGING prints through rich, keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.update(bench_phases(iterations, rounds))
+        results.update(bench_requests(max(1, iterations // 10), rounds))
+    return {
+        "version": 1,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "django": _package_version("django"),
+            "djangorestframework": _package_version("djangorestframework"),
+            "drf-apischema": _package_version("drf-apischema"),
+            "iterations": iterations,
+            "rounds": rounds,
+            "phase_settings": phase_settings,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """Return the metrics of `current` that are slower or allocate more than `baseline` by over `threshold`."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for metric in ("ns", "bytes"):
+            if not base.get(metric):
+                continue
+            change = metrics[metric] / base[metric] - 1
+            if change > threshold:
+                regressions.append(
+                    {
+                        "name": name,
+                        "metric": metric,
+                        "baseline": base[metric],
+                        "current": metrics[metric],
+                        "change": round(change, 4),
+                    }
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per round for the phase benchmarks")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds per benchmark, the median is reported")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored JSON report")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change flagged as regression")
+    options = parser.parse_args(argv)
+
+    report = run(options.iterations, options.rounds)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(report, baseline, options.threshold)
+
+    content = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(content)
+    else:
+        print(content)
+
+    for regression in report.get("regressions", []):
+        print(
+            f"REGRESSION {regression['name']} {regression['metric']}: "
+            f"{regression['baseline']} -> {regression['current']} ({regression['change']:+.1%})",
+            file=sys.stderr,
+        )
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
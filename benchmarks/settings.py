@@ -0,0 +1,32 @@
+"""
+Django settings for the apischema benchmarks.
+
+Based on the playground project, with an in-memory database and without the
+middleware that is not relevant to the measured code paths.
+"""
+
+from playground.playground.settings import *  # noqa: F403
+
+DEBUG = False
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+DATABASE_ROUTERS = []
+
+MIDDLEWARE = []
+
+DRF_APISCHEMA_SETTINGS = {}
+
+ROOT_URLCONF = "benchmarks.urls"
+
+REST_FRAMEWORK = {
+    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_AUTHENTICATION_CLASSES": [],
+    "DEFAULT_PERMISSION_CLASSES": [],
+    "UNAUTHENTICATED_USER": None,
+}
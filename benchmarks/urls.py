@@ -0,0 +1,12 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from .views import make_user_viewsets, make_viewsets
+
+router = DefaultRouter()
+for prefix, viewset in {**make_viewsets(), **make_user_viewsets()}.items():
+    router.register(prefix, viewset, basename=prefix)
+
+urlpatterns = [
+    path("api/", include(router.urls)),
+]
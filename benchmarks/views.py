@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet, ViewSet
+
+from drf_apischema import ASRequest, apischema
+
+ROWS = [{"id": i, "username": f"user{i}"} for i in range(20)]
+
+PAGE_SIZE = 50
+
+
+class RowOut(serializers.Serializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+
+
+class SquareQuery(serializers.Serializer):
+    n = serializers.IntegerField(default=2)
+
+
+class SquareOut(serializers.Serializer):
+    result = serializers.IntegerField()
+
+
+class UserRowOut(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["id", "username", "email", "date_joined"]
+
+
+class GroupRowOut(serializers.ModelSerializer):
+    class Meta:
+        model = Group
+        fields = ["id", "name"]
+
+
+class BareViewSet(ViewSet):
+    """Plain DRF baseline, validating by hand what apischema validates for us."""
+
+    def list(self, request):
+        return Response(RowOut(ROWS, many=True).data)
+
+    @action(methods=["get"], detail=False)
+    def square(self, request):
+        serializer = SquareQuery(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        n = serializer.validated_data["n"]
+        return Response(SquareOut({"result": n * n}).data)
+
+
+def make_sync_viewset():
+    class SyncViewSet(ViewSet):
+        @apischema(permissions=[AllowAny], response=RowOut(many=True))
+        def list(self, request):
+            return RowOut(ROWS, many=True).data
+
+        @apischema(permissions=[AllowAny], query=SquareQuery, response=SquareOut)
+        @action(methods=["get"], detail=False)
+        def square(self, request: ASRequest[SquareQuery]):
+            n = request.validated_data["n"]
+            return SquareOut({"result": n * n}).data
+
+    return SyncViewSet
+
+
+def make_async_viewset():
+    class AsyncViewSet(ViewSet):
+        @apischema(permissions=[AllowAny], response=RowOut(many=True))
+        async def list(self, request):
+            return RowOut(ROWS, many=True).data
+
+        @apischema(permissions=[AllowAny], query=SquareQuery, response=SquareOut)
+        @action(methods=["get"], detail=False)
+        async def square(self, request: ASRequest[SquareQuery]):
+            n = request.validated_data["n"]
+            return SquareOut({"result": n * n}).data
+
+    return AsyncViewSet
+
+
+def make_sync_user_viewset():
+    class SyncUserViewSet(GenericViewSet):
+        queryset = User.objects.order_by("pk")
+
+        @apischema(response=UserRowOut(many=True))
+        def list(self, request):
+            return UserRowOut(self.get_queryset()[:PAGE_SIZE], many=True).data
+
+        @apischema(response=UserRowOut)
+        def retrieve(self, request, pk):
+            return UserRowOut(self.get_object()).data
+
+        @apischema(response=GroupRowOut(many=True))
+        @action(methods=["get"], detail=True)
+        def groups(self, request, pk):
+            return GroupRowOut(self.get_object().groups.all(), many=True).data
+
+        @apischema(query=SquareQuery, response=SquareOut)
+        @action(methods=["get"], detail=False)
+        def square(self, request: ASRequest[SquareQuery]):
+            n = request.validated_data["n"]
+            return SquareOut({"result": n * n}).data
+
+    return SyncUserViewSet
+
+
+def make_async_user_viewset():
+    class AsyncUserViewSet(GenericViewSet):
+        queryset = User.objects.order_by("pk")
+
+        @apischema(response=UserRowOut(many=True))
+        async def list(self, request):
+            return await sync_to_async(lambda: UserRowOut(self.get_queryset()[:PAGE_SIZE], many=True).data)()
+
+        @apischema(response=UserRowOut)
+        async def retrieve(self, request, pk):
+            return await sync_to_async(lambda: UserRowOut(self.get_object()).data)()
+
+        @apischema(response=GroupRowOut(many=True))
+        @action(methods=["get"], detail=True)
+        async def groups(self, request, pk):
+            return await sync_to_async(lambda: GroupRowOut(self.get_object().groups.all(), many=True).data)()
+
+        @apischema(query=SquareQuery, response=SquareOut)
+        @action(methods=["get"], detail=False)
+        async def square(self, request: ASRequest[SquareQuery]):
+            n = request.validated_data["n"]
+            return SquareOut({"result": n * n}).data
+
+    return AsyncUserViewSet
+
+
+def make_user_viewsets() -> dict[str, type[GenericViewSet]]:
+    """The `UserViewSet`-style viewsets over the database driven by `benchmarks.load`."""
+    return {
+        "users-sync": make_sync_user_viewset(),
+        "users-async": make_async_user_viewset(),
+    }
+
+
+def make_viewsets() -> dict[str, type[ViewSet]]:
+    """
+    Build the synthetic viewsets.
+
+    `apischema` reads `ApiSettings` when decorating, so the apischema viewsets are built
+    from factories and have to be rebuilt after the settings change.
+    """
+    return {
+        "bare": BareViewSet,
+        "sync": make_sync_viewset(),
+        "async": make_async_viewset(),
+    }
@@ -0,0 +1,9 @@
+"""WSGI entry point of the servers started by `benchmarks.load`."""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.load_settings")
+
+application = get_wsgi_application()
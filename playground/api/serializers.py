@@ -1,6 +1,11 @@
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+from drf_spectacular.types import OpenApiTypes
 from rest_framework import serializers
 
+from drf_apischema import BatchField, Loader
+
 
 class UserOut(serializers.ModelSerializer):
     class Meta:
@@ -8,9 +13,60 @@ class UserOut(serializers.ModelSerializer):
         fields = ["id", "username"]
 
 
+class ContentTypeOut(serializers.ModelSerializer):
+    class Meta:
+        model = ContentType
+        fields = ["id", "app_label", "model"]
+
+
+class PermissionOut(serializers.ModelSerializer):
+    content_type = ContentTypeOut()
+
+    class Meta:
+        model = Permission
+        fields = ["id", "codename", "content_type"]
+
+
+class GroupOut(serializers.ModelSerializer):
+    permissions = PermissionOut(many=True)
+
+    class Meta:
+        model = Group
+        fields = ["id", "name", "permissions"]
+
+
+class GroupCountLoader(Loader):
+    """Count the groups of all the users of the response in one query"""
+
+    default = 0
+    schema_type = OpenApiTypes.INT
+
+    def batch_load(self, keys):
+        rows = User.groups.through.objects.filter(user_id__in=keys).values("user_id").annotate(n=Count("id"))
+        return {row["user_id"]: row["n"] for row in rows}
+
+
+class UserDetailOut(serializers.ModelSerializer):
+    groups = GroupOut(many=True)
+    user_permissions = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    group_count = BatchField(GroupCountLoader, source="pk")
+
+    class Meta:
+        model = User
+        fields = ["id", "username", "groups", "user_permissions", "group_count"]
+
+
 class SquareOut(serializers.Serializer):
     result = serializers.IntegerField()
 
 
 class SquareQuery(serializers.Serializer):
     n = serializers.IntegerField(default=2)
+
+
+class SquareIn(serializers.Serializer):
+    n = serializers.IntegerField()
+
+
+class GroupIn(serializers.Serializer):
+    name = serializers.CharField(max_length=150)
@@ -1,10 +1,59 @@
-from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+import gzip
+import io
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission, User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.settings import spectacular_settings
+from rest_framework import mixins, serializers
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework.viewsets import GenericViewSet, ViewSet
+
+from drf_apischema import (
+    ASRequest,
+    apischema,
+    apischema_view,
+    get_concurrency_stats,
+    get_defer_stats,
+    profiling,
+)
+from drf_apischema.body import BodyLimits
+from drf_apischema.coalesce import SingleFlight, get_coalesce_key, share_response
+from drf_apischema.deferred import submit_tasks
+from drf_apischema.idempotency import get_fingerprint, get_scoped_key, get_store
+from drf_apischema.limits import limiters, register_limiter
+from drf_apischema.routing import ReadOnlyError, get_replica, use_replica
+from drf_apischema.scalar.views import render_scalar_viewer
+from drf_apischema.settings import api_settings
+from drf_apischema.sparse import get_sparse_fields_query, prune_serializer_class
+from drf_apischema.split import split_by_tag
+from drf_apischema.urls import api_docs_path
+from drf_apischema.utils import HttpError
+from drf_apischema.views import SchemaArtifactView, SchemaView, get_tag_documents
+
+from .serializers import GroupIn, GroupOut, SquareIn, UserDetailOut
+from .views import UserViewSet
 
 # Create your tests here.
 
 
 class TestApiSchema(APITestCase):
+    databases = {"default", "replica"}
+
     def setUp(self):
         self.user = User.objects.create_superuser("admin", "admin@example.com", "password")
         self.user2 = User.objects.create_user("user", "user@example.com", "password")
@@ -17,3 +66,521 @@ class TestApiSchema(APITestCase):
 
         response = self.client.get("/api/users/square/?n=5")
         self.assertEqual(response.json(), {"result": 25})
+
+    def test_max_concurrency(self):
+        limiter = UserViewSet.report.concurrency_limiter
+
+        response = self.client.get("/api/users/report/")
+        self.assertEqual(response.json(), {"users": 2})
+
+        with limiter, limiter:
+            response = self.client.get("/api/users/report/")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertEqual(limiter.in_flight, 2)
+
+        stats = get_concurrency_stats()[f"{UserViewSet.__module__}.UserViewSet.report"]
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["rejected"], 1)
+
+        with self.assertRaises(ValueError):
+            register_limiter(limiter.name, 1)
+        self.assertIs(limiters[limiter.name], limiter)
+
+    def test_max_concurrency_inherited_method(self):
+        class AViewSet(mixins.ListModelMixin, GenericViewSet):
+            queryset = User.objects.all()
+
+        class BViewSet(mixins.ListModelMixin, GenericViewSet):
+            queryset = User.objects.all()
+
+        for view in (AViewSet, BViewSet):
+            apischema_view(list=apischema(max_concurrency=2))(view)
+        self.assertEqual(AViewSet.list.concurrency_limiter.name, f"{__name__}.{AViewSet.__qualname__}.list")
+        self.assertEqual(BViewSet.list.concurrency_limiter.name, f"{__name__}.{BViewSet.__qualname__}.list")
+
+    def test_keyset_pagination(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/users/latest/")
+        data = response.json()
+        self.assertEqual(data["results"], [{"id": 2, "username": "user"}])
+        self.assertTrue(all("COUNT" not in q["sql"] and "OFFSET" not in q["sql"] for q in queries))
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(data, {"next": None, "results": [{"id": 1, "username": "admin"}]})
+
+        response = self.client.get("/api/users/latest/?cursor=invalid")
+        self.assertEqual(response.status_code, 400)
+
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        parameters = [i["name"] for i in schema["paths"]["/api/users/latest/"]["get"]["parameters"]]
+        self.assertEqual(parameters, ["cursor", "page_size"])
+        self.assertIn("PaginatedUserOutList", schema["components"]["schemas"])
+
+    def test_optimize_queryset(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/users/detailed/")
+            self.assertEqual(response.status_code, 200)
+            return len(queries), response.json()
+
+        group = Group.objects.create(name="staff")
+        group.permissions.set(Permission.objects.all()[:3])
+        self.user.groups.add(group)
+        self.user.user_permissions.set(Permission.objects.all()[:2])
+        expected, data = count_queries()
+        self.assertEqual(len(data[0]["groups"][0]["permissions"]), 3)
+        self.assertEqual([i["group_count"] for i in data], [1, 0])
+
+        for i in range(5):
+            user = User.objects.create_user(f"user{i}")
+            group = Group.objects.create(name=f"group{i}")
+            group.permissions.set(Permission.objects.all()[i : i + 2])
+            user.groups.add(group)
+        queries, data = count_queries()
+        self.assertEqual(queries, expected)
+        self.assertEqual([i["group_count"] for i in data], [1, 0, 1, 1, 1, 1, 1])
+
+    def test_sparse_fields(self):
+        group = Group.objects.create(name="staff")
+        group.permissions.set(Permission.objects.all()[:1])
+        self.user.groups.add(group)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/users/detailed/?fields=username,groups.name")
+        self.assertEqual(response.json()[0], {"username": "admin", "groups": [{"name": "staff"}]})
+        sqls = [q["sql"] for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(sqls), 2)
+        self.assertNotIn("password", sqls[0])
+        self.assertNotIn("permission", " ".join(sqls))
+
+        query = get_sparse_fields_query(UserDetailOut)
+        trees = []
+        for fields in ("username,groups.name,groups.id", "groups.id,groups.name,username"):
+            serializer = query(data={"fields": fields})
+            serializer.is_valid(raise_exception=True)
+            trees.append(serializer.validated_data["fields"])
+        self.assertEqual(trees[0], trees[1])
+        self.assertIs(prune_serializer_class(UserDetailOut, trees[0]), prune_serializer_class(UserDetailOut, trees[1]))
+        self.assertEqual(list(prune_serializer_class(UserDetailOut, trees[0])().fields), ["username", "groups"])
+
+        response = self.client.get("/api/users/detailed/?fields=groups.unknown")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/users/detailed/?fields=username.id")
+        self.assertEqual(response.status_code, 400)
+
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        parameters = schema["paths"]["/api/users/detailed/"]["get"]["parameters"]
+        self.assertEqual(parameters[0]["name"], "fields")
+        self.assertIn("`groups.permissions.content_type.model`", parameters[0]["description"])
+
+    def test_sparse_fields_body(self):
+        class GroupViewSet(ViewSet):
+            @apischema(body=GroupIn, response=GroupOut, sparse_fields=True)
+            def create(self, request: ASRequest[GroupIn]):
+                return {"id": 1, **request.validated_data}
+
+        view = GroupViewSet.as_view({"post": "create"})
+        response = view(APIRequestFactory().post("/?fields=name", {"name": ""}, format="json"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("name", response.data["errors"])
+
+        response = view(APIRequestFactory().post("/?fields=name", {"name": "staff"}, format="json"))
+        self.assertEqual(response.data, {"name": "staff"})
+
+    def test_sparse_fields_direct_serializer(self):
+        class UOut(serializers.ModelSerializer):
+            class Meta:
+                model = User
+                fields = ["id", "username", "email", "date_joined"]
+
+        class UViewSet(GenericViewSet):
+            queryset = User.objects.order_by("id")
+
+            @apischema(response=UOut(many=True), sparse_fields=True, optimize_queryset=True)
+            def list(self, request):
+                # Rendered regardless of the selection, nothing can be deferred
+                return UOut(self.get_queryset(), many=True).data
+
+        for i in range(10):
+            User.objects.create_user(f"user{i}", email=f"user{i}@example.com")
+        view = UViewSet.as_view({"get": "list"})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(APIRequestFactory().get("/?fields=username"))
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("SELECT")]), 1)
+        self.assertEqual(response.data[0], {"username": "admin"})
+        self.assertEqual(len(response.data), 12)
+
+    def test_scalar_vendored_assets(self):
+        response = self.client.get("/api-docs/scalar/")
+        self.assertContains(response, "cdn.jsdelivr.net")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "scalar.js"
+            source.write_text("console.log('scalar')")
+            api_settings.SCALAR_ASSETS_DIR = f"{tmp}/assets"
+            render_scalar_viewer.cache_clear()
+            try:
+                call_command("scalar_vendor", source=str(source), stdout=io.StringIO())
+
+                response = self.client.get("/api-docs/scalar/")
+                html = response.content.decode()
+                self.assertNotIn("cdn.jsdelivr.net", html)
+                self.assertIn('name="csrfmiddlewaretoken"', html)
+                self.client.get("/api-docs/scalar/")
+                self.assertEqual(render_scalar_viewer.cache_info().hits, 1)
+
+                url = html.split('<script src="')[1].split('"')[0]
+                self.assertRegex(url, r"/api-docs/scalar/assets/api-reference\.[0-9a-f]{16}\.js$")
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+                self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), b"console.log('scalar')")
+
+                response = self.client.get("/api-docs/scalar/assets/manifest.json")
+                self.assertEqual(response.status_code, 404)
+            finally:
+                api_settings.SCALAR_ASSETS_DIR = None
+                render_scalar_viewer.cache_clear()
+
+    def test_schema_export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = io.StringIO()
+            call_command("apischema_export", output_dir=tmp, stdout=out)
+            names = sorted(i.name for i in Path(tmp).iterdir())
+            self.assertIn("openapi.json.gz", names)
+            self.assertIn("openapi.yaml", names)
+            self.assertIn("manifest.json", names)
+            manifest = json.loads((Path(tmp) / "manifest.json").read_text())
+            self.assertEqual(list(manifest["tags"]), ["api", "math"])
+
+            call_command("apischema_export", output_dir=tmp, check=True, stdout=out)
+
+            request = APIRequestFactory().get("/api-docs/openapi.json/?format=json", HTTP_ACCEPT_ENCODING="gzip")
+            response = SchemaArtifactView.as_view()(request, artifact_dir=tmp)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            schema = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+            self.assertIn("/api/users/square/", schema["paths"])
+
+            request = APIRequestFactory().get(
+                "/api-docs/openapi.json/?format=json", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            self.assertEqual(SchemaArtifactView.as_view()(request, artifact_dir=tmp).status_code, 304)
+            request = APIRequestFactory().get(
+                "/api-docs/openapi.json/?format=json", HTTP_IF_NONE_MATCH=f'"other", {response["ETag"]}'
+            )
+            self.assertEqual(SchemaArtifactView.as_view()(request, artifact_dir=tmp).status_code, 304)
+
+            for accept_encoding, encoding in [
+                ("gzip, br", "br"),
+                ("br;q=0, gzip", "gzip"),
+                ("gzip;q=0.5, br;q=0.1", "gzip"),
+                ("*;q=0", None),
+                ("identity", None),
+            ]:
+                request = APIRequestFactory().get("/api-docs/openapi.json/", HTTP_ACCEPT_ENCODING=accept_encoding)
+                response = SchemaArtifactView.as_view()(request, artifact_dir=tmp)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+
+            del schema["paths"]["/api/users/square/"]
+            schema["paths"]["/api/users/{id}/"]["get"]["summary"] = "Changed"
+            (Path(tmp) / "openapi.json").write_text(json.dumps(schema))
+            err = io.StringIO()
+            with self.assertRaises(CommandError):
+                call_command("apischema_export", output_dir=tmp, check=True, stdout=out, stderr=err)
+            self.assertEqual(err.getvalue().splitlines(), ["+ GET /api/users/square/", "~ GET /api/users/{id}/"])
+
+        with (
+            mock.patch.object(api_settings, "SCHEMA_ARTIFACT_DIR", "openapi/"),
+            mock.patch.object(spectacular_settings, "SERVE_PUBLIC", False),
+            self.assertRaises(ImproperlyConfigured),
+        ):
+            api_docs_path()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command("apischema_export", output_dir=tmp, format=["yaml"], stdout=out)
+            call_command("apischema_export", output_dir=tmp, check=True, stdout=out)
+
+    def test_split_by_tag(self):
+        index = self.client.get("/api-docs/openapi.json/tags/").json()
+        self.assertEqual([tag["name"] for tag in index["tags"]], ["api", "math"])
+
+        with self.settings(DEBUG=False):
+            for _ in range(2):
+                document = self.client.get(index["tags"][1]["url"]).json()
+            request = APIRequestFactory().get("/")
+            self.assertIs(get_tag_documents(request), get_tag_documents(request))
+            self.assertEqual(list(get_tag_documents(request).rendered), ["math"])
+        self.assertEqual(list(document["paths"]), ["/api/users/square/", "/api/users/squares/"])
+        self.assertEqual(list(document["components"]["schemas"]), ["SquareIn", "SquareOut"])
+
+        document = self.client.get(index["tags"][0]["url"]).json()
+        self.assertNotIn("/api/users/square/", document["paths"])
+        self.assertNotIn("SquareOut", document["components"]["schemas"])
+        self.assertIn("PermissionOut", document["components"]["schemas"])
+
+        url = index["tags"][0]["url"]
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": f'"other", W/{etag}'}).status_code, 304)
+        self.assertEqual(self.client.get(url, headers={"If-None-Match": f'"x{etag[1:]}'}).status_code, 200)
+        self.assertEqual(self.client.get("/api-docs/openapi.json/tags/unknown/").status_code, 404)
+
+        # Served like the whole document
+        with mock.patch.object(SchemaView, "permission_classes", [IsAdminUser]):
+            self.assertEqual(self.client.get("/api-docs/openapi.json/tags/").status_code, 403)
+            self.assertEqual(self.client.get(index["tags"][0]["url"]).status_code, 403)
+        with mock.patch.object(spectacular_settings, "SERVE_PUBLIC", False):
+            request = Request(APIRequestFactory().get("/"))
+            self.assertIsNot(get_tag_documents(request), get_tag_documents(request))
+            document = self.client.get(index["tags"][1]["url"]).json()
+            self.assertEqual(list(document["paths"]), ["/api/users/square/", "/api/users/squares/"])
+
+    def test_split_by_tag_url(self):
+        def rename(document):
+            documents = split_by_tag(document)
+            documents["User management/math"] = documents.pop("math")
+            return documents
+
+        with (
+            mock.patch.object(spectacular_settings, "SERVE_PUBLIC", False),
+            mock.patch("drf_apischema.views.split_by_tag", rename),
+        ):
+            tags = self.client.get("/api-docs/openapi.json/tags/").json()["tags"]
+            self.assertEqual(tags[1]["url"], "http://testserver/api-docs/openapi.json/tags/User%20management/math/")
+            document = self.client.get(tags[1]["url"]).json()
+        self.assertEqual(list(document["paths"]), ["/api/users/square/", "/api/users/squares/"])
+
+    def test_read_replica(self):
+        User.objects.db_manager("replica").create_user("replica")
+
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            response = self.client.get("/api/users/stats/")
+        self.assertEqual(response.json(), {"users": 1})
+        self.assertTrue(any("SAVEPOINT" in q["sql"] for q in queries))
+
+        with self.settings(DEBUG=True), use_replica("replica"):
+            with self.assertRaises(ReadOnlyError):
+                User.objects.create_user("write")
+
+    def test_defer(self):
+        self.client.force_authenticate(self.user)
+        max_workers, max_queue = api_settings.DEFER_MAX_WORKERS, api_settings.DEFER_MAX_QUEUE
+        api_settings.DEFER_MAX_WORKERS = 0
+        try:
+            with self.captureOnCommitCallbacks() as callbacks:
+                response = self.client.post("/api/users/2/welcome/")
+            self.assertEqual(response.json(), {"queued": True})
+            self.assertEqual(len(mail.outbox), 0)
+            for callback in callbacks:
+                callback()
+            self.assertEqual(mail.outbox[0].to, ["user@example.com"])
+
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.post("/api/users/404/welcome/")
+            self.assertEqual(callbacks, [])
+
+            # Over the queue limit, the tasks run in the request thread
+            api_settings.DEFER_MAX_WORKERS, api_settings.DEFER_MAX_QUEUE = 1, 0
+            ran = []
+            submit_tasks([(lambda: ran.append(threading.current_thread()), (), {})])
+            self.assertEqual(ran, [threading.current_thread()])
+
+            # Through the thread pool
+            api_settings.DEFER_MAX_QUEUE = 1
+            started, release = threading.Event(), threading.Event()
+            submit_tasks([(lambda: (started.set(), release.wait(5)), (), {})])
+            self.assertTrue(started.wait(5))
+            stats = get_defer_stats()
+            self.assertEqual((stats["queued"], stats["running"]), (0, 1))
+            release.set()
+
+            # Inline in a read-only request, the task isn't routed to the replica
+            api_settings.DEFER_MAX_WORKERS = 0
+            with self.settings(DEBUG=True), use_replica("replica"):
+                submit_tasks([(lambda: ran.append(get_replica()), (), {})])
+            self.assertEqual(ran[-1], None)
+        finally:
+            api_settings.DEFER_MAX_WORKERS, api_settings.DEFER_MAX_QUEUE = max_workers, max_queue
+        for _ in range(50):
+            if get_defer_stats()["running"] == 0:
+                break
+            time.sleep(0.1)
+        stats = get_defer_stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["queued"], 0)
+        self.assertGreaterEqual(stats["succeeded"], 1)
+
+    def test_profiling(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            api_settings.PROFILE_DIR = tmp
+            try:
+                response = self.client.get("/api/users/report/", headers={"X-Profile": "1"})
+                self.assertNotIn("Server-Timing", response)
+                self.assertEqual(list(Path(tmp).iterdir()), [])
+
+                self.client.force_authenticate(self.user)
+                response = self.client.get("/api/users/report/", headers={"X-Profile": "1"})
+                self.assertEqual(response.json(), {"users": 2})
+                self.assertIn("sql;dur=", response["Server-Timing"])
+                profile_id = response["Server-Timing"].rsplit('desc="', 1)[1].rstrip('"')
+
+                report = json.loads((Path(tmp) / f"{profile_id}.json").read_text())
+                self.assertEqual(report["status"], 200)
+                self.assertGreater(report["memory_peak_bytes"], 0)
+                self.assertTrue(any("COUNT" in q["sql"] for q in report["queries"]))
+                self.assertTrue((Path(tmp) / report["profile"]).exists())
+
+                # Sampled requests are profiled without exposing the timings
+                self.client.force_authenticate(None)
+                with mock.patch.object(api_settings, "PROFILE_SAMPLE_RATE", 1.0):
+                    response = self.client.get("/api/users/report/")
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("Server-Timing", response)
+                self.assertEqual(len(list(Path(tmp).glob("*.json"))), 2)
+                self.client.force_authenticate(self.user)
+
+                # Another request is being profiled, or the profiler can't start: the request runs unprofiled
+                with profiling._profiling:
+                    response = self.client.get("/api/users/report/", headers={"X-Profile": "1"})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("Server-Timing", response)
+                api_settings.PROFILER = "unknown"
+                with self.assertLogs("drf_apischema.profiling", "ERROR"):
+                    response = self.client.get("/api/users/report/", headers={"X-Profile": "1"})
+                self.assertEqual(response.json(), {"users": 2})
+                self.assertNotIn("Server-Timing", response)
+            finally:
+                api_settings.PROFILE_DIR = None
+                api_settings.PROFILER = "cprofile"
+
+    def test_body_limits(self):
+        response = self.client.post("/api/users/squares/", [{"n": 2}, {"n": 3}], format="json")
+        self.assertEqual(response.json(), [{"result": 4}, {"result": 9}])
+
+        response = self.client.post("/api/users/squares/", [{"n": i} for i in range(101)], format="json")
+        self.assertEqual(response.status_code, 413)
+
+        body = b"[" + b" " * 20000 + b'{"n": 2}]'
+        response = self.client.post("/api/users/squares/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 413)
+
+        # The byte limit is only inferred on demand
+        body = SquareIn(many=True, max_length=100)
+        self.assertIsNone(BodyLimits.from_body(body).max_json_bytes)
+        self.assertEqual(BodyLimits.from_body(body).max_items, 100)
+        self.assertIsNotNone(BodyLimits.from_body(body, "infer").max_json_bytes)
+
+    def test_idempotency(self):
+        for store in ("drf_apischema.idempotency.CacheStore", "drf_apischema.idempotency.DatabaseStore"):
+            api_settings.IDEMPOTENCY_STORE = store
+            try:
+                headers = {"Idempotency-Key": store}
+                with self.captureOnCommitCallbacks(execute=True):
+                    first = self.client.post("/api/users/group/", {"name": store}, headers=headers)
+                with self.captureOnCommitCallbacks(execute=True):
+                    retry = self.client.post("/api/users/group/", {"name": store}, headers=headers)
+                self.assertEqual(retry.content, first.content)
+                self.assertEqual(retry["Content-Type"], first["Content-Type"])
+                self.assertEqual(retry["Idempotent-Replayed"], "true")
+                self.assertEqual(Group.objects.filter(name=store).count(), 1)
+
+                response = self.client.post("/api/users/group/", {"name": "other"}, headers=headers)
+                self.assertEqual(response.status_code, 422)
+
+                request = APIRequestFactory().post("/api/users/group/", {"name": "x"})
+                request = Request(request, parsers=[MultiPartParser()])
+                request.user = self.user
+                get_store(store).claim(get_scoped_key(request, "in-flight"), get_fingerprint(request), None)
+                self.client.force_authenticate(self.user)
+                headers = {"Idempotency-Key": "in-flight"}
+                response = self.client.post("/api/users/group/", {"name": "x"}, headers=headers)
+                self.client.force_authenticate(None)
+                self.assertEqual(response.status_code, 409)
+
+                # The key is released when the view fails, the retry runs it
+                headers = {"Idempotency-Key": "failed"}
+                with mock.patch.object(Group.objects, "create", side_effect=HttpError("Failed", status=503)):
+                    response = self.client.post("/api/users/group/", {"name": f"{store}-failed"}, headers=headers)
+                self.assertEqual(response.status_code, 503)
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post("/api/users/group/", {"name": f"{store}-failed"}, headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn("Idempotent-Replayed", response)
+            finally:
+                api_settings.IDEMPOTENCY_STORE = "drf_apischema.idempotency.CacheStore"
+
+    def test_coalesce(self):
+        single_flight = UserViewSet.stats.single_flight
+        executions = single_flight.executions
+        for _ in range(2):
+            self.assertEqual(self.client.get("/api/users/stats/").json(), {"users": 0})
+        # Sequential requests aren't coalesced, a completed result isn't reused
+        self.assertEqual(single_flight.executions, executions + 2)
+
+        single_flight = SingleFlight("test", timeout=5)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        results = []
+
+        def fn():
+            calls.append(threading.current_thread().name)
+            started.set()
+            release.wait(5)
+            if len(calls) == 1:
+                raise KeyboardInterrupt
+            time.sleep(0.2)
+            return ["result"]
+
+        def leader():
+            try:
+                single_flight.run("key", fn)
+            except KeyboardInterrupt:
+                pass
+
+        threads = [threading.Thread(target=leader, name="leader")]
+        threads[0].start()
+        started.wait(5)
+        for i in range(5):
+            threads.append(threading.Thread(target=lambda: results.append(single_flight.run("key", fn))))
+            threads[-1].start()
+        while single_flight.coalesced < 5:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        # The cancelled leader is replaced by one follower, all the others share its result
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results, [["result"]] * 5)
+        self.assertEqual(len({id(i) for i in results}), 5)
+        self.assertEqual(single_flight.stats()["in_flight"], 0)
+
+        single_flight.timeout = 0.01
+        release.clear()
+        calls.clear()
+        thread = threading.Thread(target=lambda: single_flight.run("key", fn))
+        thread.start()
+        started.wait(5)
+        with self.assertRaises(HttpError) as e:
+            single_flight.run("key", fn)
+        self.assertEqual(e.exception.status, 503)
+        release.set()
+        thread.join(5)
+
+        factory = APIRequestFactory()
+        key = get_coalesce_key(factory.get("/api/users/stats/?b=1&a=2"))
+        self.assertEqual(get_coalesce_key(factory.get("/api/users/stats/?a=2&b=1")), key)
+        self.assertNotEqual(get_coalesce_key(factory.get("/api/users/stats/?a=2&b=1&c=3")), key)
+        self.assertNotEqual(get_coalesce_key(factory.get("/api/users/stats/?b=1&a=2", HTTP_ACCEPT="text/html")), key)
+
+        # The followers are built from a snapshot, without the headers of the leader's own request
+        response = Response({"users": [1]}, headers={"X-Total": "1", "Server-Timing": "total;dur=1"})
+        factory = share_response(response)
+        response.data["users"].append(2)
+        response["Allow"] = "GET"
+        shared = factory()
+        self.assertEqual(shared.data, {"users": [1]})
+        self.assertEqual(shared["X-Total"], "1")
+        self.assertNotIn("Server-Timing", shared)
+        self.assertNotIn("Allow", shared)
+        self.assertIsNot(factory(), shared)
@@ -12,5 +12,5 @@ router.register("users", UserViewSet)
 urlpatterns = [
     path("api/", include(router.urls)),
     # Auto-generate /api-docs/xxx, include /api-docs/scalar/
-    api_docs_path(),
+    api_docs_path(split_by_tag=True),
 ]
@@ -1,16 +1,22 @@
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
+from django.core.mail import send_mail
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.viewsets import GenericViewSet
 
-from drf_apischema import ASRequest, apischema, apischema_view
+from drf_apischema import ASRequest, Keyset, apischema, apischema_view
 from drf_apischema.decorator import action
 
-from .serializers import SquareOut, SquareQuery, UserOut
+from .serializers import GroupIn, GroupOut, SquareIn, SquareOut, SquareQuery, UserDetailOut, UserOut
 
 # Create your views here.
 
 
+def send_welcome_email(pk: int):
+    user = User.objects.get(pk=pk)
+    send_mail("Welcome", f"Welcome {user.username}", None, [user.email])
+
+
 @apischema_view(
     retrieve=apischema(summary="Retrieve a user"),
 )
@@ -21,6 +27,11 @@ class UserViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
     serializer_class = UserOut
     # permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action == "detailed":
+            return UserDetailOut
+        return super().get_serializer_class()
+
     # Define a view that requires permissions
     @apischema(permissions=[IsAdminUser])
     def list(self, request):
@@ -37,7 +48,7 @@ class UserViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
         """Echo the request"""
         return self.get_serializer(self.get_object()).data
 
-    @apischema(query=SquareQuery, response=SquareOut)
+    @apischema(query=SquareQuery, response=SquareOut, tags=["math"])
     @action(methods=["get"], detail=False)
     def square(self, request: ASRequest[SquareQuery]):
         """The square of a number"""
@@ -51,3 +62,59 @@ class UserViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin):
         # but it will wrap it with rest_framework.response.Response
         # So you don't need to manually wrap it with Response
         return SquareOut({"result": n * n}).data
+
+    @apischema(
+        body=SquareIn(many=True, max_length=100),
+        response=SquareOut(many=True),
+        tags=["math"],
+        max_body_bytes="infer",
+    )
+    @action(methods=["post"], detail=False)
+    def squares(self, request: ASRequest[SquareIn]):
+        """The squares of up to 100 numbers
+
+        Bodies over the size inferred from `SquareIn` or with more than 100 items are rejected before parsing
+        """
+        return SquareOut([{"result": i["n"] * i["n"]} for i in request.validated_data], many=True).data
+
+    @apischema(max_concurrency=2)
+    @action(methods=["get"], detail=False)
+    def report(self, request):
+        """An expensive report, at most 2 run at the same time"""
+        return {"users": User.objects.count()}
+
+    @apischema(paginate=Keyset(ordering="-date_joined", page_size=1), response=UserOut)
+    @action(methods=["get"], detail=False)
+    def latest(self, request):
+        """Latest users, paginated without OFFSET and COUNT(*)"""
+        return self.get_queryset()
+
+    @apischema(optimize_queryset=True, sparse_fields=True, response=UserDetailOut(many=True))
+    @action(methods=["get"], detail=False)
+    def detailed(self, request):
+        """Users with their groups and permissions
+
+        The relations are loaded along with the users, `?fields=id,groups.name` selects the rendered fields
+        """
+        return self.get_serializer(self.get_queryset(), many=True).data
+
+    @apischema(read_only=True, coalesce=True)
+    @action(methods=["get"], detail=False)
+    def stats(self, request):
+        """User statistics, read from the replica
+
+        Identical concurrent requests share one execution
+        """
+        return {"users": User.objects.count()}
+
+    @action(methods=["post"], detail=True)
+    def welcome(self, request: ASRequest, pk):
+        """Send a welcome email once the response is sent"""
+        request.defer(send_welcome_email, self.get_object().pk)
+        return {"queued": True}
+
+    @apischema(body=GroupIn, response=GroupOut, idempotent=True)
+    @action(methods=["post"], detail=False)
+    def group(self, request: ASRequest[GroupIn]):
+        """Create a group, retries with the same `Idempotency-Key` get the first response"""
+        return GroupOut(Group.objects.create(**request.validated_data)).data
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "drf_spectacular",
+    "drf_apischema",
     "drf_apischema.scalar",
     "playground.api",
 ]
@@ -83,9 +84,15 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.replica.sqlite3",
+    },
 }
 
+DATABASE_ROUTERS = ["drf_apischema.routing.ReadReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -149,6 +156,13 @@ REST_FRAMEWORK = {
 }
 
 
+# drf-apischema
+
+DRF_APISCHEMA_SETTINGS = {
+    "READ_REPLICA": "replica",
+}
+
+
 # drf-spectacular
 
 SPECTACULAR_SETTINGS = {
@@ -8,9 +8,18 @@ __all__ = [
     "check_exists",
     "get_object_or_404",
     "is_accept_json",
+    "get_concurrency_stats",
+    "get_defer_stats",
+    "Keyset",
+    "Loader",
+    "BatchField",
 ]
 
 from .core import apischema, apischema_view
+from .deferred import get_defer_stats
+from .limits import get_concurrency_stats
+from .loaders import BatchField, Loader
+from .pagination import Keyset
 from .request import ASRequest
 from .response import NumberResponse, StatusResponse
 from .utils import HttpError, check_exists, get_object_or_404, is_accept_json
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+from pathlib import Path
+
+from django.http import FileResponse, Http404, HttpRequest, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+"""Content encodings of the precompressed variants, by preference"""
+
+
+def content_hash(content: bytes, length: int = 16) -> str:
+    return hashlib.sha256(content).hexdigest()[:length]
+
+
+def compress_brotli(content: bytes) -> bytes | None:
+    """Brotli compress `content`, `None` if the optional `brotli` package isn't installed."""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(content, quality=11)
+
+
+def write_precompressed(path: Path, content: bytes) -> list[Path]:
+    """Write `content` to `path` along with its gzip and brotli variants, return the written files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    written = [path]
+
+    gz_path = path.with_name(f"{path.name}.gz")
+    # mtime=0 keeps the output reproducible
+    gz_path.write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    written.append(gz_path)
+
+    br_content = compress_brotli(content)
+    if br_content is not None:
+        br_path = path.with_name(f"{path.name}.br")
+        br_path.write_bytes(br_content)
+        written.append(br_path)
+    return written
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """The q-value of each content coding of an `Accept-Encoding` header."""
+    codings = {}
+    for item in header.split(","):
+        name, *params = item.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[name] = q
+    return codings
+
+
+def etag_matches(request: HttpRequest, etag: str) -> bool:
+    """Whether the `If-None-Match` header of `request` matches `etag`, with the weak comparison."""
+    etags = parse_etags(request.headers.get("if-none-match", ""))
+    return "*" in etags or etag.removeprefix("W/") in {i.removeprefix("W/") for i in etags}
+
+
+def serve_precompressed(
+    request: HttpRequest,
+    path: Path,
+    content_type: str | None = None,
+    etag: str | None = None,
+    cache_control: str | None = None,
+):
+    """Serve `path`, or its precompressed variant written by `write_precompressed` that the client prefers."""
+    if not path.is_file():
+        raise Http404
+    if etag is not None:
+        # Weak, the precompressed variants share it
+        etag = f'W/"{etag}"'
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+            response.headers["ETag"] = etag
+            return response
+
+    codings = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+    qualities = {name: codings.get(name, codings.get("*", 0.0)) for name, _ in ENCODINGS}
+    served, encoding = path, None
+    # By q-value, then by preference, `q=0` refuses the coding
+    for name, suffix in sorted(ENCODINGS, key=lambda i: qualities[i[0]], reverse=True):
+        variant = path.with_name(f"{path.name}{suffix}")
+        if qualities[name] > 0 and variant.is_file():
+            served, encoding = variant, name
+            break
+
+    content_type = content_type or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    response = FileResponse(served.open("rb"), content_type=content_type)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if cache_control is not None:
+        response.headers["Cache-Control"] = cache_control
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import inspect
+import re
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from django.http.request import RawPostDataException
+from django.utils.translation import gettext_lazy as _
+from rest_framework import relations, serializers, status
+
+from .utils import HttpError
+
+_SCALAR_BYTES = 64
+"""Upper bound of the JSON encoding of numbers, booleans, dates, uuids and primary keys"""
+
+_SLACK_BYTES = 4096
+"""Room for whitespace on top of twice the compact encoding, when the limit is inferred"""
+
+_SCALAR_FIELDS = (
+    serializers.BooleanField,
+    serializers.IntegerField,
+    serializers.FloatField,
+    serializers.DecimalField,
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DurationField,
+    serializers.UUIDField,
+    relations.PrimaryKeyRelatedField,
+)
+
+_JSON_TOKENS = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{},]')
+
+
+def _field_bytes(field: serializers.Field) -> int | None:
+    """The largest compact JSON encoding of `field`, or `None` if it's unbounded."""
+    if field.read_only or isinstance(field, serializers.HiddenField):
+        return 0
+    if isinstance(field, (serializers.ListSerializer, serializers.ListField)):
+        child = _field_bytes(field.child)  # type: ignore
+        if field.max_length is None or child is None:  # type: ignore
+            return None
+        return field.max_length * (child + 1) + 2  # type: ignore
+    if isinstance(field, serializers.Serializer):
+        total = 2
+        for name, subfield in field.fields.items():
+            size = _field_bytes(subfield)
+            if size is None:
+                return None
+            total += len(name) + 4 + size
+        return total
+    if isinstance(field, serializers.MultipleChoiceField):
+        return None
+    if isinstance(field, serializers.ChoiceField):
+        return max((len(str(i)) for i in field.choices), default=0) * 6 + 2
+    if isinstance(field, serializers.CharField):
+        # Every character may be escaped as `\uXXXX`
+        return None if field.max_length is None else field.max_length * 6 + 2
+    if isinstance(field, _SCALAR_FIELDS):
+        return _SCALAR_BYTES
+    return None
+
+
+def _as_serializer(body: Any) -> serializers.BaseSerializer | None:
+    if inspect.isclass(body) and issubclass(body, serializers.BaseSerializer):
+        return body()
+    if isinstance(body, serializers.BaseSerializer):
+        return body
+    return None
+
+
+def infer_max_json_bytes(body: Any) -> int | None:
+    """A bound of the JSON bodies `body` can accept, if all its fields are bounded."""
+    serializer = _as_serializer(body)
+    size = None if serializer is None else _field_bytes(serializer)
+    return None if size is None else size * 2 + _SLACK_BYTES
+
+
+def infer_max_items(body: Any) -> int | None:
+    """The `max_length` of a `many=True` body serializer."""
+    serializer = _as_serializer(body)
+    if isinstance(serializer, serializers.ListSerializer):
+        return serializer.max_length
+    return None
+
+
+def count_json_items(data: bytes, limit: int) -> int | None:
+    """
+    Count the items of the top-level JSON array in `data` without decoding them, stopping past `limit`.
+
+    Returns `None` if `data` isn't an array, the parser reports it.
+    """
+    data = data.lstrip()
+    if not data.startswith(b"["):
+        return None
+    if data[1:].lstrip().startswith(b"]"):
+        return 0
+    count = 1
+    depth = 0
+    for match in _JSON_TOKENS.finditer(data):
+        token = match.group()
+        if token in (b"[", b"{"):
+            depth += 1
+        elif token in (b"]", b"}"):
+            depth -= 1
+            if depth == 0:
+                break
+        elif token == b"," and depth == 1:
+            count += 1
+            if count > limit:
+                break
+    return count
+
+
+def _is_json(request) -> bool:
+    return request.content_type.split(";")[0].strip().endswith("json")
+
+
+@dataclass(frozen=True)
+class BodyLimits:
+    """The size checks run on the raw body before it's parsed."""
+
+    max_bytes: int | None = None
+    max_json_bytes: int | None = None
+    """Inferred from the serializer with `max_bytes="infer"`, only applies to JSON bodies"""
+    max_items: int | None = None
+
+    @classmethod
+    def from_body(
+        cls, body: Any, max_bytes: int | Literal["infer"] | None = None, max_items: int | None = None
+    ) -> BodyLimits:
+        """`max_bytes="infer"` bounds the JSON bodies from the fields of `body`, other bodies aren't bounded."""
+        infer = max_bytes == "infer"
+        return cls(
+            max_bytes=None if infer else max_bytes,  # type: ignore
+            max_json_bytes=infer_max_json_bytes(body) if infer else None,
+            max_items=infer_max_items(body) if max_items is None else max_items,
+        )
+
+    def __bool__(self):
+        return self.max_bytes is not None or self.max_json_bytes is not None or self.max_items is not None
+
+    def check(self, request):
+        """Reject with 413 the bodies over the limits, from `Content-Length` and a scan of the raw JSON array."""
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            return
+        if not length:
+            return
+        is_json = _is_json(request)
+        max_bytes = self.max_bytes if self.max_bytes is not None or not is_json else self.max_json_bytes
+        if max_bytes is not None and length > max_bytes:
+            raise HttpError(
+                _("Request body too large, at most {} bytes are allowed.").format(max_bytes),
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        if self.max_items is None or not is_json:
+            return
+        try:
+            # The body is bounded by `max_bytes` or `DATA_UPLOAD_MAX_MEMORY_SIZE`, and kept for the parser
+            data = getattr(request, "_request", request).body
+        except RawPostDataException:
+            return
+        count = count_json_items(data, self.max_items)
+        if count is not None and count > self.max_items:
+            raise HttpError(
+                _("Too many items, at most {} are allowed.").format(self.max_items),
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
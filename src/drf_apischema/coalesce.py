@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from copy import copy, deepcopy
+from functools import partial
+from typing import Any, Callable, Hashable
+
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase, StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.response import Response
+
+from .settings import api_settings
+from .utils import HttpError
+
+COALESCED_METHODS = ("GET", "HEAD")
+
+_LEADER_HEADERS = frozenset(("server-timing", "allow", "vary"))
+"""Headers describing the leader's own request, the followers get theirs"""
+
+
+def _share_copy(result: Any) -> Callable[[], Any]:
+    return partial(copy, result)
+
+
+class FlightCancelled(Exception):
+    """The leader of a flight was interrupted, its followers start a new flight."""
+
+
+class SingleFlight:
+    """
+    Run one execution per key at a time within a process, the concurrent callers with the same key
+    wait for it and share its result.
+
+    The wrapper of `apischema` is synchronous for sync and async views alike (async views run
+    through `async_to_sync`), so a lock and a thread-safe future cover both.
+    """
+
+    def __init__(self, name: str, timeout: float | None = None):
+        self.name = name
+        self.timeout = timeout
+        self.executions = 0
+        self.coalesced = 0
+        self._flights: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        share: Callable[[Any], Callable[[], Any] | None] = _share_copy,
+    ) -> Any:
+        """
+        Run `fn`, or wait for the flight of `key` in progress and return a result built for this caller.
+
+        The leader calls `share(result)` before publishing it, the followers each call the factory it returns,
+        or run `fn` themselves if it returns `None`.
+        """
+        while True:
+            with self._lock:
+                future = self._flights.get(key)
+                is_leader = future is None
+                if is_leader:
+                    future = self._flights[key] = Future()
+                    self.executions += 1
+                else:
+                    self.coalesced += 1
+            if is_leader:
+                return self._lead(key, future, fn, share)
+
+            try:
+                factory = future.result(self.timeout)
+            except FlightCancelled:
+                continue
+            except FutureTimeoutError:
+                raise HttpError(
+                    _("Service temporarily unavailable, please retry later."),
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(api_settings.CONCURRENCY_RETRY_AFTER)},
+                )
+            except Exception as e:
+                raise _copy_exception(e) from None
+            if factory is None:
+                return fn()
+            return factory()
+
+    def _lead(self, key: Hashable, future: Future, fn: Callable[[], Any], share: Callable) -> Any:
+        try:
+            result = fn()
+        except Exception as e:
+            self._land(key)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Cancelled or interrupted, another caller runs it instead
+            self._land(key)
+            future.set_exception(FlightCancelled())
+            raise
+        try:
+            # Taken before the leader's caller gets to change the result
+            factory = share(result)
+        except Exception:
+            # The followers run it themselves
+            factory = None
+        # The new callers start a new flight instead of sharing a result that's already computed
+        self._land(key)
+        future.set_result(factory)
+        return result
+
+    def _land(self, key: Hashable):
+        with self._lock:
+            del self._flights[key]
+
+    def stats(self) -> dict[str, int | float | None]:
+        return {
+            "timeout": self.timeout,
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+def _copy_exception(exc: Exception) -> Exception:
+    # Each follower raises its own exception, so that their tracebacks aren't mixed up
+    try:
+        return copy(exc)
+    except Exception:
+        return exc
+
+
+def get_coalesce_key(request) -> str:
+    """The method, the path, the user, the `Accept` header and all the query parameters of `request`."""
+    user = getattr(request, "user", None)
+    owner = user.pk if user is not None and user.is_authenticated else ""
+    query = sorted(request.GET.lists())
+    accept = request.headers.get("accept", "")
+    return json.dumps([request.method, request.path, owner, accept, query], default=str)
+
+
+def share_response(response: HttpResponseBase) -> Callable[[], HttpResponseBase] | None:
+    """
+    Snapshot `response` for the followers of a flight, `None` if it can't be shared (streaming).
+
+    Each follower gets its own response from the snapshot, DRF then finalizes and renders it
+    for its own request, while the leader's response goes on independently.
+    """
+    if isinstance(response, StreamingHttpResponse):
+        return None
+    headers = tuple((k, v) for k, v in response.items() if k.lower() not in _LEADER_HEADERS)
+    if isinstance(response, Response):
+        data = deepcopy(response.data)
+        kwargs = {
+            "status": response.status_code,
+            "template_name": response.template_name,
+            "exception": response.exception,
+            "content_type": response.content_type,
+        }
+        return partial(_build_response, Response, headers, data, **kwargs)
+    content = response.content  # type: ignore
+    return partial(_build_response, HttpResponse, headers, content, status=response.status_code)
+
+
+def _build_response(cls, headers: tuple[tuple[str, str], ...], *args, **kwargs) -> HttpResponseBase:
+    response = cls(*args, **kwargs)
+    for key, value in headers:
+        response[key] = value
+    return response
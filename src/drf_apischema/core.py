@@ -6,11 +6,12 @@ import sys
 import traceback
 from copy import copy
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Iterable, Sequence
+from typing import Any, Awaitable, Callable, Iterable, Literal, Sequence
 
 from asgiref.sync import async_to_sync, iscoroutinefunction
 from django.db import connection
 from django.db import transaction as _transaction
+from django.db.models import QuerySet
 from django.http import Http404
 from django.http.response import HttpResponseBase
 from django.utils.translation import gettext_lazy as _
@@ -24,10 +25,21 @@ from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 from rest_framework.settings import api_settings as drf_api_settings
 
+from .body import BodyLimits
+from .coalesce import COALESCED_METHODS, SingleFlight, get_coalesce_key, share_response
+from .deferred import DeferredTasks, submit_tasks
 from .helpers import any_success, is_action_view, is_not_empty_none, true_empty_str
+from .idempotency import run_idempotent
+from .limits import register_limiter
+from .loaders import LoaderRegistry
+from .optimizer import build_plan
+from .pagination import Keyset, get_item_serializer_class
+from .profiling import profile_request
 from .request import ASRequest
 from .response import StatusResponse
+from .routing import use_replica
 from .settings import api_settings, with_override
+from .sparse import FieldsTree, get_only_fields, get_sparse_fields_query, prune_data, prune_serializer_class
 from .utils import HttpError, is_accept_json
 
 _SerializerType = Serializer | type[Serializer]
@@ -39,6 +51,10 @@ class ProcessEvent:
     view: Callable | None
     args: tuple
     kwargs: dict
+    response_serializer: type[Serializer] | None = None
+    sparse_fields: FieldsTree | None = None
+    sparse_rendered: bool = False
+    """Whether the view got the pruned serializer, otherwise its response data is pruned to `sparse_fields`"""
 
     def get_object(self):
         return self.view.get_object() if self.detail else None  # type: ignore
@@ -73,6 +89,16 @@ class ArgCollection:
     transaction: bool | None = None
     sqllogging: bool | None = None
     deprecated: bool = False
+    max_concurrency: int | None = None
+    queue_timeout: float | None = None
+    paginate: Keyset | None = None
+    optimize_queryset: bool | None = None
+    sparse_fields: bool | None = None
+    read_only: bool | None = None
+    max_body_bytes: int | Literal["infer"] | None = None
+    max_items: int | None = None
+    idempotent: bool | None = None
+    coalesce: bool | None = None
 
     def override(self, other: ArgCollection):
         self.func = self.func if other.func is None else other.func
@@ -93,6 +119,22 @@ class ArgCollection:
         if other.sqllogging is not None:
             raise ValueError("Sqllogging cannot be set after the first call")
         self.deprecated = self.deprecated if other.deprecated is None else other.deprecated
+        if other.max_concurrency is not None or other.queue_timeout is not None:
+            raise ValueError("Max concurrency cannot be set after the first call")
+        if other.paginate is not None:
+            raise ValueError("Paginate cannot be set after the first call")
+        if other.optimize_queryset is not None:
+            raise ValueError("Optimize queryset cannot be set after the first call")
+        if other.sparse_fields is not None:
+            raise ValueError("Sparse fields cannot be set after the first call")
+        if other.read_only is not None:
+            raise ValueError("Read only cannot be set after the first call")
+        if other.max_body_bytes is not None or other.max_items is not None:
+            raise ValueError("Body limits cannot be set after the first call")
+        if other.idempotent is not None:
+            raise ValueError("Idempotent cannot be set after the first call")
+        if other.coalesce is not None:
+            raise ValueError("Coalesce cannot be set after the first call")
         return self
 
 
@@ -135,6 +177,16 @@ def apischema(
     transaction: bool | None = None,
     sqllogging: bool | None = None,
     deprecated: bool = False,
+    max_concurrency: int | None = None,
+    queue_timeout: float | None = None,
+    paginate: Keyset | None = None,
+    optimize_queryset: bool | None = None,
+    sparse_fields: bool | None = None,
+    read_only: bool | None = None,
+    max_body_bytes: int | Literal["infer"] | None = None,
+    max_items: int | None = None,
+    idempotent: bool | None = None,
+    coalesce: bool | None = None,
     **kwargs,
 ) -> Callable[..., Callable[..., HttpResponseBase | Awaitable[HttpResponseBase]]]:
     """
@@ -150,6 +202,25 @@ def apischema(
     :param transaction: Whether to use a transaction for the endpoint.
     :param sqllogging: Whether to log SQL queries for the endpoint.
     :param deprecated: Whether to mark the endpoint as deprecated.
+    :param max_concurrency: The maximum in-flight executions of the endpoint within a process,
+        requests over it are rejected with 503 and `Retry-After`.
+    :param queue_timeout: Seconds a request waits for a free slot before being rejected, fails fast if not set.
+    :param paginate: The pagination of the queryset returned by the view, e.g. `Keyset(ordering="-created")`.
+    :param optimize_queryset: Whether to `select_related`/`prefetch_related` the relations rendered by the response
+        serializer in `view.get_queryset()`.
+    :param sparse_fields: Whether to accept a `fields` query parameter selecting the fields of the response serializer,
+        the serializer of the view is pruned and the columns that aren't rendered deferred.
+    :param read_only: Whether to route the queries of the endpoint to the `READ_REPLICA` database,
+        defaults to the `READ_REPLICA_METHODS` setting.
+    :param max_body_bytes: The largest accepted request body, checked from `Content-Length` before parsing it,
+        bigger bodies are rejected with 413. `"infer"` bounds the JSON bodies from the fields of `body`,
+        if they're all bounded: the read-only fields and unknown keys clients may send aren't accounted for.
+    :param max_items: The most items accepted in a JSON array body, counted before parsing it,
+        defaults to the `max_length` of a `many=True` body serializer.
+    :param idempotent: Whether to store the response of requests with an `Idempotency-Key` header
+        and replay it to the retries with the same key.
+    :param coalesce: Whether identical concurrent GET requests of a user share a single execution within a process,
+        keyed on the path and the validated query data, the others get a copy of its response.
     :param kwargs: Additional keyword arguments to pass to the `extend_schema` decorator.
     """
 
@@ -169,11 +240,23 @@ def apischema(
             transaction=transaction,
             sqllogging=sqllogging,
             deprecated=deprecated,
+            max_concurrency=max_concurrency,
+            queue_timeout=queue_timeout,
+            paginate=paginate,
+            optimize_queryset=optimize_queryset,
+            sparse_fields=sparse_fields,
+            read_only=read_only,
+            max_body_bytes=max_body_bytes,
+            max_items=max_items,
+            idempotent=idempotent,
+            coalesce=coalesce,
         )
         is_first_call = not hasattr(func, "argcollection")
 
         if not is_first_call:
             args = getattr(func, "argcollection").override(args)
+        else:
+            _merge_query(args)
 
         _responses = _get_responses(args)
         _summary, _description = _get_summary_and_description(args)
@@ -182,8 +265,12 @@ def apischema(
             func = _get_wrapper(func, args)
             setattr(func, "argcollection", args)
 
+        _parameters = list(parameters or ([args.query] if args.query else []))
+        if args.idempotent:
+            _parameters.append(_get_idempotency_parameter())
+
         return extend_schema(
-            parameters=parameters or ([args.query] if args.query else None),
+            parameters=_parameters or None,
             request=(None if is_action_view(args.func) else empty) if args.body is empty else args.body,
             responses=_responses,
             summary=_summary,
@@ -195,9 +282,31 @@ def apischema(
     return decorator
 
 
+def _get_idempotency_parameter():
+    return OpenApiParameter(
+        api_settings.IDEMPOTENCY_HEADER,
+        str,
+        OpenApiParameter.HEADER,
+        description=_("A unique key of the request, its retries with the same key get the stored response."),
+    )
+
+
+def _merge_query(e: ArgCollection):
+    """Add the query parameters of the pagination and sparse fields to the `query` serializer."""
+    if e.paginate is not None:
+        e.query = e.paginate.get_query_serializer(e.query)
+    if e.sparse_fields:
+        response = get_item_serializer_class(e.response) if e.response is not empty else None
+        if not (inspect.isclass(response) and issubclass(response, serializers.Serializer)):
+            raise ValueError("Sparse fields need a response serializer")
+        e.query = get_sparse_fields_query(response, e.query)
+
+
 def _get_responses(e: ArgCollection):
     response = e.response
-    if response is not empty and inspect.isclass(response):
+    if response is not empty and e.paginate is not None:
+        response = e.paginate.get_response_serializer(response)
+    elif response is not empty and inspect.isclass(response):
         response = e.response()
     responses = {} if e.responses is empty else e.responses
     if response is not empty:
@@ -256,30 +365,107 @@ def _create_event(view_args, view_kwargs):
     return ProcessEvent(request=request, view=view, args=view_args, kwargs=view_kwargs)
 
 
+def _get_view_name(func, args):
+    # Methods wrapped by `apischema_view` keep the qualname of the class defining them, e.g. a mixin
+    if args.cls is not None:
+        return f"{args.cls.__module__}.{args.cls.__qualname__}.{func.__name__}"
+    return f"{func.__module__}.{func.__qualname__}"
+
+
 def _get_wrapper(func, args):
     is_async = iscoroutinefunction(func)
     use_transaction = with_override(api_settings.TRANSACTION, args.transaction)
     use_logging = with_override(api_settings.SQL_LOGGING, args.sqllogging)
+    use_optimizer = with_override(api_settings.OPTIMIZE_QUERYSET, args.optimize_queryset)
+    replica = api_settings.READ_REPLICA
+    body_limits = BodyLimits.from_body(args.body, args.max_body_bytes, args.max_items)
+    replica_methods = api_settings.READ_REPLICA_METHODS
+    name = _get_view_name(func, args)
+    limiter = None
+    if args.max_concurrency is not None:
+        limiter = register_limiter(name, args.max_concurrency, args.queue_timeout)
+    single_flight = None
+    if args.coalesce:
+        single_flight = SingleFlight(name, api_settings.COALESCE_TIMEOUT)
+
+    def respond(event, loaders):
+        response = _execute_view(func, event, is_async)
+
+        if args.paginate is not None and isinstance(response, QuerySet):
+            response = _paginate(response, event, args, use_optimizer)
+        elif event.sparse_fields and not event.sparse_rendered:
+            response = _prune_response(response, event.sparse_fields)
+
+        if loaders.has_pending:
+            response = _resolve_loaders(response, loaders)
+
+        return _after_request(response)
+
+    def process(event, using=None):
+        loaders = event.request.loaders = LoaderRegistry()
+        tasks = DeferredTasks()
+        event.request.defer = tasks.defer
+        if body_limits:
+            body_limits.check(event.request)
+        _before_request(event, args)
+
+        if args.sparse_fields:
+            _select_sparse_fields(event, args, use_optimizer)
+        if use_optimizer:
+            _optimize_queryset(event, args)
+
+        def execute():
+            if not use_transaction:
+                return respond(event, loaders)
+            with _transaction.atomic(using=using):
+                response = respond(event, loaders)
+                if tasks:
+                    _transaction.on_commit(functools.partial(submit_tasks, tasks.take()), using=using)
+            return response
+
+        if args.idempotent:
+            # Around the transaction, the key is released if it rolls back or fails to commit
+            execute = functools.partial(run_idempotent, event.request, using, execute)
+
+        if single_flight is not None and event.request.method in COALESCED_METHODS:
+            response = single_flight.run(get_coalesce_key(event.request), execute, share_response)
+        else:
+            response = execute()
 
-    @functools.wraps(func)
-    def wrapper(*view_args, **view_kwargs):
-        event = _create_event(view_args, view_kwargs)
-        try:
-            _before_request(event, args)
+        if use_logging:
+            _log_sql_queries()
 
-            if use_transaction:
-                with _transaction.atomic():
-                    response = _execute_view(func, event, is_async)
-            else:
-                response = _execute_view(func, event, is_async)
+        if tasks:
+            submit_tasks(tasks.take())
+        return response
 
-            if use_logging:
-                _log_sql_queries()
+    def route(event):
+        if replica is None:
+            return process(event)
+        read_only = args.read_only if args.read_only is not None else event.request.method in replica_methods
+        if not read_only:
+            return process(event)
+        with use_replica(replica):
+            return process(event, replica)
 
-            return _after_request(response)
+    def handle(event):
+        try:
+            if limiter is not None:
+                with limiter:
+                    return route(event)
+            return route(event)
         except Exception as e:
             return _handle_exception(e, event)
 
+    @functools.wraps(func)
+    def wrapper(*view_args, **view_kwargs):
+        event = _create_event(view_args, view_kwargs)
+        if api_settings.PROFILE_DIR is not None:
+            return profile_request(event.request, event.view, functools.partial(handle, event))
+        return handle(event)
+
+    wrapper.concurrency_limiter = limiter  # type: ignore
+    wrapper.single_flight = single_flight  # type: ignore
     return wrapper
 
 
@@ -296,6 +482,119 @@ def _execute_view(func, event, is_async):
         return func(*event.args, **event.kwargs)
 
 
+def _get_response_serializer_class(
+    event: ProcessEvent, args: ArgCollection, sparse: bool = True
+) -> type[Serializer] | None:
+    """The serializer rendering the items of the response: the declared one, pruned if `sparse`, or the view's one."""
+    if sparse and event.response_serializer is not None:
+        return event.response_serializer
+    if args.response is not empty:
+        serializer_class = get_item_serializer_class(args.response)
+    elif hasattr(event.view, "get_serializer_class"):
+        serializer_class = event.view.get_serializer_class()  # type: ignore
+    else:
+        return None
+    if inspect.isclass(serializer_class) and issubclass(serializer_class, serializers.BaseSerializer):
+        return serializer_class  # type: ignore
+    return None
+
+
+def _select_sparse_fields(event: ProcessEvent, args: ArgCollection, optimize: bool):
+    tree = event.request.validated_query.get("fields")
+    if not tree:
+        return
+    serializer_class = get_item_serializer_class(args.response)
+    pruned = event.response_serializer = prune_serializer_class(serializer_class, tree)
+    event.sparse_fields = tree
+
+    view = event.view
+    if hasattr(view, "get_serializer_class"):
+        get_serializer_class = view.get_serializer_class  # type: ignore
+
+        def sparse_get_serializer_class():
+            view_serializer_class = get_serializer_class()
+            if view_serializer_class is not serializer_class:
+                return view_serializer_class
+            event.sparse_rendered = True
+            return pruned
+
+        view.get_serializer_class = sparse_get_serializer_class  # type: ignore
+
+    if hasattr(view, "get_serializer"):
+        get_serializer = view.get_serializer  # type: ignore
+
+        def sparse_get_serializer(*args, **kwargs):
+            serializer = get_serializer(*args, **kwargs)
+            # Only the querysets rendered by the pruned serializer skip the columns it doesn't read
+            if type(getattr(serializer, "child", serializer)) is pruned and isinstance(serializer.instance, QuerySet):
+                serializer.instance = _narrow_queryset(serializer.instance, serializer_class, pruned, optimize)
+            return serializer
+
+        view.get_serializer = sparse_get_serializer  # type: ignore
+
+
+def _narrow_queryset(
+    queryset: QuerySet, serializer_class: type[Serializer], pruned: type[Serializer], optimize: bool
+) -> QuerySet:
+    """Load the relations and the columns `pruned` reads instead of those of `serializer_class`."""
+    model = queryset.model
+    if optimize:
+        queryset = build_plan(pruned, model).apply(build_plan(serializer_class, model).revert(queryset))
+    only = get_only_fields(pruned, model)
+    select_related = queryset.query.select_related
+    if only is None or select_related is True:
+        return queryset
+    if select_related:
+        # A relation can't be both deferred and followed
+        only += tuple(select_related)  # type: ignore
+    return queryset.only(*only)
+
+
+def _prune_response(response, tree: FieldsTree):
+    if isinstance(response, Response):
+        response.data = prune_data(response.data, tree)
+    elif not isinstance(response, HttpResponseBase):
+        response = prune_data(response, tree)
+    return response
+
+
+def _optimize_queryset(event: ProcessEvent, args: ArgCollection):
+    view = event.view
+    if view is None or not hasattr(view, "get_queryset"):
+        return
+    get_queryset = view.get_queryset
+
+    def optimized_get_queryset():
+        queryset = get_queryset()
+        # Planned for the whole serializer, the views may render it regardless of the sparse fields
+        serializer_class = _get_response_serializer_class(event, args, sparse=False)
+        if serializer_class is None or not isinstance(queryset, QuerySet):
+            return queryset
+        return build_plan(serializer_class, queryset.model).apply(queryset)
+
+    view.get_queryset = optimized_get_queryset  # type: ignore
+
+
+def _paginate(queryset: QuerySet, event: ProcessEvent, args: ArgCollection, optimize: bool):
+    view = event.view
+    serializer_class = _get_response_serializer_class(event, args)
+    if event.response_serializer is not None:
+        queryset = _narrow_queryset(queryset, get_item_serializer_class(args.response), serializer_class, optimize)
+    if args.response is empty and hasattr(view, "get_serializer_context"):
+        context = view.get_serializer_context()  # type: ignore
+    else:
+        context = {"request": event.request, "view": view}
+    return args.paginate.paginate(queryset, event.request, serializer_class, context)  # type: ignore
+
+
+def _resolve_loaders(response, loaders: LoaderRegistry):
+    if isinstance(response, Response):
+        response.data = loaders.resolve(response.data)
+    elif not isinstance(response, HttpResponseBase):
+        response = loaders.resolve(response)
+    return response
+
+
 def _after_request(response):
     if response is None:
         response = Response(status=status.HTTP_204_NO_CONTENT)
@@ -330,39 +629,46 @@ def _check_permissions(event: ProcessEvent, args: ArgCollection):
     raise HttpError(_("You do not have permission to perform this action."), status=status.HTTP_403_FORBIDDEN)
 
 
+def _build_serializer(declared, instance, data) -> serializers.BaseSerializer:
+    if isinstance(declared, serializers.BaseSerializer):
+        serializer = copy(declared)
+        serializer.instance = instance
+        serializer.initial_data = data
+        return serializer
+    return declared(instance=instance, data=data)
+
+
 def _validate_request(event: ProcessEvent, args: ArgCollection):
+    """
+    Validate the query and the body independently, `request.serializer` and `request.validated_data` are the body's
+    if it's declared, the query's otherwise, `request.validated_query` is always the query's.
+    """
+    has_body = is_not_empty_none(args.body)
+    if args.query is None and not has_body:
+        return
+    instance = event.get_object()
+
     serializer = None
     if args.query is not None:
-        if isinstance(args.query, serializers.BaseSerializer):
-            serializer = copy(args.query)
-            serializer.instance = event.get_object()
-            serializer.initial_data = event.query_data
-        else:
-            serializer = args.query(instance=event.get_object(), data=event.query_data)
-
-    elif is_not_empty_none(args.body):
-        if isinstance(args.body, serializers.BaseSerializer):
-            serializer = copy(args.body)
-            serializer.instance = event.get_object()
-            serializer.initial_data = event.body_data
-        else:
-            serializer = args.body(instance=event.get_object(), data=event.body_data)
-    else:
-        return
+        serializer = _build_serializer(args.query, instance, event.query_data)
+        serializer.is_valid(raise_exception=True)
+        serializer.context["request"] = event.request
+        event.request.validated_query = serializer.validated_data
 
-    if serializer:
+    if has_body:
+        serializer = _build_serializer(args.body, instance, event.body_data)
         serializer.is_valid(raise_exception=True)
         serializer.context["request"] = event.request
 
-        event.request.serializer = serializer
-        event.request.validated_data = serializer.validated_data
+    event.request.serializer = serializer
+    event.request.validated_data = serializer.validated_data  # type: ignore
 
 
 def _handle_exception(exc: Exception, event: ProcessEvent):
     if isinstance(exc, Http404):
         raise exc
     if isinstance(exc, HttpError):
-        return Response(exc.content, status=exc.status)
+        return Response(exc.content, status=exc.status, headers=exc.headers)
     if isinstance(exc, ValidationError):
         return Response({"errors": exc.detail}, status=exc.status_code)
     if isinstance(exc, NotFound):
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import close_old_connections
+
+from .routing import use_replica
+from .settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+_Task = tuple[Callable, tuple, dict]
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+
+
+class DeferredTasks:
+    """The work deferred by a request with `request.defer(fn, *args, **kwargs)`."""
+
+    def __init__(self):
+        self._tasks: list[_Task] = []
+
+    def __bool__(self):
+        return bool(self._tasks)
+
+    def defer(self, fn: Callable, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` after the transaction commits, or after the response is produced."""
+        self._tasks.append((fn, args, kwargs))
+
+    def take(self) -> list[_Task]:
+        tasks, self._tasks = self._tasks, []
+        return tasks
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """The pool of the deferred tasks, its queue is unbounded so `submit_tasks` bounds it with `DEFER_MAX_QUEUE`."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=api_settings.DEFER_MAX_WORKERS,
+                    thread_name_prefix="apischema-defer",
+                )
+    return _executor
+
+
+def _update_stats(**changes: int):
+    with _stats_lock:
+        for key, value in changes.items():
+            _stats[key] += value
+
+
+def run_task(fn: Callable, args: tuple, kwargs: dict):
+    """Run a deferred task, its errors are logged and don't affect the other tasks."""
+    _update_stats(running=1)
+    try:
+        # In the request thread, the task isn't part of a read-only request routed to the replica
+        with use_replica(None):
+            if iscoroutinefunction(fn):
+                async_to_sync(fn)(*args, **kwargs)
+            else:
+                fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Deferred task %r failed", fn)
+        _update_stats(running=-1, failed=1)
+    else:
+        _update_stats(running=-1, succeeded=1)
+
+
+def _run_in_worker(fn: Callable, args: tuple, kwargs: dict):
+    _update_stats(queued=-1)
+    # The worker threads outlive the tasks, handle their connections like Django does for requests
+    close_old_connections()
+    try:
+        run_task(fn, args, kwargs)
+    finally:
+        close_old_connections()
+
+
+def _reserve_queue() -> bool:
+    max_queue = api_settings.DEFER_MAX_QUEUE
+    with _stats_lock:
+        if max_queue is not None and _stats["queued"] >= max_queue:
+            return False
+        _stats["queued"] += 1
+    return True
+
+
+def submit_tasks(tasks: list[_Task]):
+    """
+    Run `tasks` in the thread pool, or right away if `DEFER_MAX_WORKERS` is 0.
+
+    The tasks over `DEFER_MAX_QUEUE` waiting for a worker also run right away, slowing down
+    the requests instead of piling up in memory.
+    """
+    _update_stats(submitted=len(tasks))
+    for fn, args, kwargs in tasks:
+        if api_settings.DEFER_MAX_WORKERS and _reserve_queue():
+            _get_executor().submit(_run_in_worker, fn, args, kwargs)
+        else:
+            run_task(fn, args, kwargs)
+
+
+def get_defer_stats() -> dict[str, Any]:
+    """Counts of the deferred tasks of the process, for monitoring."""
+    with _stats_lock:
+        stats: dict[str, Any] = dict(_stats)
+    stats["max_workers"] = api_settings.DEFER_MAX_WORKERS
+    stats["max_queue"] = api_settings.DEFER_MAX_QUEUE
+    return stats
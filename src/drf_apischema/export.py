@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from django.utils.text import slugify
+
+from .artifacts import content_hash, write_precompressed
+from .split import HTTP_METHODS, split_by_tag
+
+MANIFEST_NAME = "manifest.json"
+
+FORMATS = ("json", "yaml")
+
+
+def generate_schema(urlconf: str | None = None, request=None) -> dict[str, Any]:
+    """
+    Generate the OpenAPI document the way `SpectacularAPIView` does for `urlconf`.
+
+    Unless `SERVE_PUBLIC`, only the endpoints `request` is allowed to use are included.
+    """
+    from drf_spectacular.settings import spectacular_settings
+
+    urlconf = urlconf or spectacular_settings.SERVE_URLCONF
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(urlconf=urlconf)
+    return generator.get_schema(request=request, public=spectacular_settings.SERVE_PUBLIC)
+
+
+def render_schema(schema: dict[str, Any], format: str) -> bytes:
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+
+    renderer = OpenApiJsonRenderer() if format == "json" else OpenApiYamlRenderer()
+    return renderer.render(schema, renderer_context={})
+
+
+def write_schema_artifact(schema: dict[str, Any], output_dir: Path, formats=FORMATS) -> list[Path]:
+    """
+    Write the rendered document and its sub-documents by tag, with their precompressed variants
+    and a manifest of their content hashes.
+    """
+    manifest: dict[str, Any] = {"files": {}}
+    written = []
+    for format in formats:
+        content = render_schema(schema, format)
+        name = f"openapi.{format}"
+        written.extend(write_precompressed(output_dir / name, content))
+        manifest["files"][format] = {"name": name, "hash": content_hash(content)}
+
+    manifest["tags"] = {}
+    for old in (output_dir / "tags").glob("*"):
+        old.unlink()
+    for tag, document in split_by_tag(json.loads(render_schema(schema, "json"))).items():
+        content = render_schema(document, "json")
+        name = f"tags/{slugify(tag) or 'tag'}-{content_hash(tag.encode(), 8)}.json"
+        written.extend(write_precompressed(output_dir / name, content))
+        manifest["tags"][tag] = {"name": name, "hash": content_hash(content)}
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+    written.append(manifest_path)
+    load_manifest.cache_clear()
+    return written
+
+
+@lru_cache(maxsize=None)
+def load_manifest(artifact_dir: Path) -> dict[str, Any]:
+    return json.loads((artifact_dir / MANIFEST_NAME).read_text())
+
+
+def load_schema_artifact(artifact_dir: Path) -> dict[str, Any]:
+    """The document of the artifact, from whichever format was written."""
+    files = load_manifest(artifact_dir)["files"]
+    if "json" in files:
+        return json.loads((artifact_dir / files["json"]["name"]).read_bytes())
+    if "yaml" in files:
+        import yaml
+
+        return yaml.safe_load((artifact_dir / files["yaml"]["name"]).read_bytes())
+    raise FileNotFoundError(f"No OpenAPI document in {artifact_dir / MANIFEST_NAME}")
+
+
+def _operations(schema: dict[str, Any]) -> dict[tuple[str, str], Any]:
+    return {
+        (method.upper(), path): operation
+        for path, item in schema.get("paths", {}).items()
+        for method, operation in item.items()
+        if method in HTTP_METHODS
+    }
+
+
+def diff_schemas(old: dict[str, Any], new: dict[str, Any]) -> list[str]:
+    """The differences between two documents, by operation and by component."""
+    lines = []
+    old_operations, new_operations = _operations(old), _operations(new)
+    for key in sorted(old_operations.keys() | new_operations.keys(), key=lambda x: (x[1], x[0])):
+        if key not in new_operations:
+            lines.append(f"- {key[0]} {key[1]}")
+        elif key not in old_operations:
+            lines.append(f"+ {key[0]} {key[1]}")
+        elif old_operations[key] != new_operations[key]:
+            lines.append(f"~ {key[0]} {key[1]}")
+
+    for section, components in new.get("components", {}).items():
+        old_components = old.get("components", {}).get(section, {})
+        for name in sorted(old_components.keys() | components.keys()):
+            if name not in components:
+                lines.append(f"- components/{section}/{name}")
+            elif name not in old_components:
+                lines.append(f"+ components/{section}/{name}")
+            elif old_components[name] != components[name]:
+                lines.append(f"~ components/{section}/{name}")
+    for section in old.get("components", {}).keys() - new.get("components", {}).keys():
+        lines.extend(f"- components/{section}/{name}" for name in sorted(old["components"][section]))
+
+    rest = {k for k in old.keys() | new.keys() if k not in ("paths", "components")}
+    lines.extend(f"~ {key}" for key in sorted(rest) if old.get(key) != new.get(key))
+    return lines
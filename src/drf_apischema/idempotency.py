@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import lru_cache, partial
+from typing import Callable
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase, StreamingHttpResponse
+from django.template.response import SimpleTemplateResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+
+from .settings import api_settings
+from .utils import HttpError
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_POLL_INTERVAL = 0.05
+
+
+@dataclass
+class StoredResponse:
+    """The response of a request with an idempotency key, or its in-flight marker if not `completed`."""
+
+    fingerprint: str
+    completed: bool = False
+    status_code: int | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    content: bytes = b""
+
+    @classmethod
+    def from_response(cls, fingerprint: str, response: HttpResponseBase) -> StoredResponse | None:
+        """The rendered `response` as it was sent, `None` if it can't be replayed."""
+        if isinstance(response, StreamingHttpResponse) or response.status_code >= 500:
+            return None
+        return cls(fingerprint, True, response.status_code, dict(response.items()), response.content)  # type: ignore
+
+    def to_response(self) -> HttpResponse:
+        response = HttpResponse(self.content, status=self.status_code)
+        for key, value in self.headers.items():
+            response[key] = value
+        response[REPLAYED_HEADER] = "true"
+        return response
+
+
+class CacheStore:
+    """Store the responses in the `IDEMPOTENCY_CACHE` cache, claims are atomic with `cache.add()`."""
+
+    def __init__(self):
+        from django.core.cache import caches
+
+        self.cache = caches[api_settings.IDEMPOTENCY_CACHE]
+
+    def _key(self, key: str) -> str:
+        return f"drf_apischema:idempotency:{key}"
+
+    def claim(self, key: str, fingerprint: str, using: str | None) -> StoredResponse | None:
+        if self.cache.add(self._key(key), StoredResponse(fingerprint), api_settings.IDEMPOTENCY_LOCK_TTL):
+            return None
+        return self.cache.get(self._key(key)) or StoredResponse(fingerprint)
+
+    def save(self, key: str, stored: StoredResponse, using: str | None):
+        self.cache.set(self._key(key), stored, api_settings.IDEMPOTENCY_TTL)
+
+    def release(self, key: str, using: str | None):
+        self.cache.delete(self._key(key))
+
+
+class DatabaseStore:
+    """
+    Store the responses in the `IdempotencyRecord` table.
+
+    The in-flight row is committed when the key is claimed, and completed with the response
+    once the transaction of the endpoint commits.
+    """
+
+    def claim(self, key: str, fingerprint: str, using: str | None) -> StoredResponse | None:
+        from .models import IdempotencyRecord
+
+        records = IdempotencyRecord.objects.db_manager(using)
+        now = timezone.now()
+        records.filter(
+            Q(created__lt=now - timedelta(seconds=api_settings.IDEMPOTENCY_TTL))
+            | Q(completed=False, created__lt=now - timedelta(seconds=api_settings.IDEMPOTENCY_LOCK_TTL)),
+            key=key,
+        ).delete()
+        try:
+            with transaction.atomic(using=using):
+                records.create(key=key, fingerprint=fingerprint)
+            return None
+        except IntegrityError:
+            pass
+        record = records.filter(key=key).first()
+        if record is None:
+            return StoredResponse(fingerprint)
+        return StoredResponse(
+            record.fingerprint, record.completed, record.status_code, record.headers, bytes(record.content)
+        )
+
+    def save(self, key: str, stored: StoredResponse, using: str | None):
+        from .models import IdempotencyRecord
+
+        IdempotencyRecord.objects.db_manager(using).filter(key=key).update(
+            completed=True, status_code=stored.status_code, headers=stored.headers, content=stored.content
+        )
+
+    def release(self, key: str, using: str | None):
+        from .models import IdempotencyRecord
+
+        if transaction.get_connection(using).needs_rollback:
+            # The claim rolls back along with the enclosing transaction
+            return
+        IdempotencyRecord.objects.db_manager(using).filter(key=key).delete()
+
+
+@lru_cache(maxsize=None)
+def get_store(path: str) -> CacheStore | DatabaseStore:
+    return import_string(path)()
+
+
+def get_fingerprint(request) -> str:
+    """The hash of the method, the path and the parsed body of the request."""
+    data = json.dumps(getattr(request, "data", None), sort_keys=True, default=str)
+    return hashlib.sha256(f"{request.method}\n{request.get_full_path()}\n{data}".encode()).hexdigest()
+
+
+def get_scoped_key(request, key: str) -> str:
+    """The key of `request`, scoped by user so that a key can't replay another user's response."""
+    user = getattr(request, "user", None)
+    owner = user.pk if user is not None and user.is_authenticated else ""
+    return hashlib.sha256(f"{owner}\n{key}".encode()).hexdigest()
+
+
+def run_idempotent(request, using: str | None, respond: Callable[[], HttpResponseBase]) -> HttpResponseBase:
+    """
+    Run `respond` once per idempotency key: replay the stored response of a key, wait up to
+    `IDEMPOTENCY_WAIT` seconds for the request in flight with the same key, or reject it with 409.
+
+    `respond` runs the transaction of the endpoint, the key is released if it raises (rollback included).
+    """
+    key = request.headers.get(api_settings.IDEMPOTENCY_HEADER)
+    if not key:
+        return respond()
+    if len(key) > 255:
+        raise HttpError(_("Invalid idempotency key."), status=status.HTTP_400_BAD_REQUEST)
+
+    store = get_store(api_settings.IDEMPOTENCY_STORE)
+    key = get_scoped_key(request, key)
+    fingerprint = get_fingerprint(request)
+    deadline = time.monotonic() + api_settings.IDEMPOTENCY_WAIT
+    while (stored := store.claim(key, fingerprint, using)) is not None:
+        if stored.fingerprint != fingerprint:
+            raise HttpError(
+                _("The idempotency key was used by another request."),
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if stored.completed:
+            return stored.to_response()
+        if time.monotonic() >= deadline:
+            raise HttpError(
+                _("A request with the same idempotency key is in progress."),
+                status=status.HTTP_409_CONFLICT,
+                headers={"Retry-After": str(api_settings.CONCURRENCY_RETRY_AFTER)},
+            )
+        time.sleep(_POLL_INTERVAL)
+
+    try:
+        response = respond()
+    except BaseException:
+        store.release(key, using)
+        raise
+
+    def save(response: HttpResponseBase):
+        stored = StoredResponse.from_response(fingerprint, response)
+        if stored is None:
+            store.release(key, using)
+        else:
+            # Once the enclosing transaction, if any, commits, a rollback leaves the claim to `IDEMPOTENCY_LOCK_TTL`
+            transaction.on_commit(partial(store.save, key, stored, using), using=using)
+
+    if isinstance(response, SimpleTemplateResponse):
+        # Stored once rendered for the negotiated media type, the retries get the same bytes back
+        response.add_post_render_callback(save)
+    else:
+        save(response)
+    return response
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+
+from .settings import api_settings
+from .utils import HttpError
+
+limiters: dict[str, ConcurrencyLimiter] = {}
+"""All the concurrency limiters of the process, by endpoint name"""
+
+
+class ConcurrencyLimiter:
+    """
+    Cap the in-flight executions of an endpoint within a process.
+
+    The wrapper of `apischema` is synchronous for sync and async views alike (async views run
+    through `async_to_sync`), so a thread semaphore covers both.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, queue_timeout: float | None = None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be greater than 0")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if self.queue_timeout:
+            acquired = self._semaphore.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        with self._lock:
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+        if not acquired:
+            raise HttpError(
+                _("Service temporarily unavailable, please retry later."),
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(api_settings.CONCURRENCY_RETRY_AFTER)},
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict[str, int | float | None]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+
+def register_limiter(name: str, max_concurrency: int, queue_timeout: float | None = None) -> ConcurrencyLimiter:
+    """Create the limiter of the endpoint `name`, which must be unique within the process."""
+    limiter = ConcurrencyLimiter(name, max_concurrency, queue_timeout)
+    if limiters.setdefault(name, limiter) is not limiter:
+        raise ValueError(f"A concurrency limiter named {name!r} is already registered")
+    return limiter
+
+
+def get_concurrency_stats() -> dict[str, dict[str, int | float | None]]:
+    """Current in-flight and rejection counts of every limited endpoint, for monitoring."""
+    return {name: limiter.stats() for name, limiter in limiters.items()}
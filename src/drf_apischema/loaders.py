@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from typing import Any, Hashable, Iterable, Mapping, Sequence
+
+from drf_spectacular.extensions import OpenApiSerializerFieldExtension
+from drf_spectacular.plumbing import build_basic_type
+from drf_spectacular.types import OpenApiTypes
+from rest_framework import serializers
+
+
+class Loader:
+    """
+    Batch the per-item lookups of a response into one call.
+
+    Subclass it and implement `batch_load`, then render the values with a `BatchField`:
+
+        class GroupCountLoader(Loader):
+            default = 0
+            schema_type = OpenApiTypes.INT
+
+            def batch_load(self, keys):
+                rows = User.groups.through.objects.filter(user_id__in=keys).values("user_id").annotate(n=Count("id"))
+                return {row["user_id"]: row["n"] for row in rows}
+
+        class UserOut(serializers.ModelSerializer):
+            group_count = BatchField(GroupCountLoader, source="pk")
+    """
+
+    default: Any = None
+    """The value of the keys missing from the result of `batch_load`"""
+
+    schema_type: OpenApiTypes = OpenApiTypes.ANY
+    """The OpenAPI type of the values"""
+
+    def batch_load(self, keys: list) -> Mapping[Any, Any] | Sequence[Any]:
+        """Load all `keys` at once, return the values by key or in the order of `keys`."""
+        raise NotImplementedError("`batch_load()` must be implemented.")
+
+    def load_many(self, keys: list) -> dict[Any, Any]:
+        values = self.batch_load(keys)
+        if not isinstance(values, Mapping):
+            values = dict(zip(keys, values))
+        return values
+
+
+class Pending:
+    """Placeholder of a value in the response data, filled in once its loader has run."""
+
+    __slots__ = ("loader", "key", "default")
+
+    def __init__(self, loader: type[Loader], key: Hashable, default: Any):
+        self.loader = loader
+        self.key = key
+        self.default = default
+
+
+class LoaderRegistry:
+    """The loaders of a request, reachable as `request.loaders`."""
+
+    def __init__(self):
+        self._loaders: dict[type[Loader], Loader] = {}
+        self._pending = 0
+
+    def __getitem__(self, loader_class: type[Loader]) -> Loader:
+        loader = self._loaders.get(loader_class)
+        if loader is None:
+            loader = self._loaders[loader_class] = loader_class()
+        return loader
+
+    @property
+    def has_pending(self) -> bool:
+        return self._pending > 0
+
+    def load(self, loader_class: type[Loader], key: Hashable, default: Any = None) -> Pending:
+        """Register `key` to be loaded by `loader_class`, the returned placeholder is filled in by `resolve`."""
+        self._pending += 1
+        return Pending(loader_class, key, self[loader_class].default if default is None else default)
+
+    def resolve(self, data: Any) -> Any:
+        """Run each loader once for all the keys registered in `data` and fill in the values."""
+        placeholders: list[tuple[Any, Any, Pending]] = []
+        _collect(data, placeholders)
+        if isinstance(data, Pending):
+            placeholders.append((None, None, data))
+
+        keys: dict[type[Loader], dict[Hashable, None]] = {}
+        for _, _, pending in placeholders:
+            keys.setdefault(pending.loader, {})[pending.key] = None
+        values = {loader_class: self[loader_class].load_many(list(k)) for loader_class, k in keys.items()}
+
+        for container, index, pending in placeholders:
+            value = values[pending.loader].get(pending.key, pending.default)
+            if container is None:
+                data = value
+            else:
+                container[index] = value
+        self._pending = 0
+        return data
+
+
+def _collect(data: Any, placeholders: list):
+    if isinstance(data, dict):
+        items: Iterable = data.items()
+    elif isinstance(data, list):
+        items = enumerate(data)
+    else:
+        return
+    for index, value in items:
+        if isinstance(value, Pending):
+            placeholders.append((data, index, value))
+        else:
+            _collect(value, placeholders)
+
+
+class BatchField(serializers.Field):
+    """A read-only field whose value is loaded by `loader` from the attribute, batched over the whole response."""
+
+    def __init__(self, loader: type[Loader], **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+        self.loader = loader
+
+    def to_representation(self, value):
+        loaders = getattr(self.context.get("request"), "loaders", None)
+        if loaders is None:
+            # Out of the apischema response path, load it right away
+            loader = self.loader()
+            return loader.load_many([value]).get(value, loader.default)
+        return loaders.load(self.loader, value)
+
+
+class BatchFieldExtension(OpenApiSerializerFieldExtension):
+    target_class = BatchField
+
+    def map_serializer_field(self, auto_schema, direction):
+        return build_basic_type(self.target.loader.schema_type)
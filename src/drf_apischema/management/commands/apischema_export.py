@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import FORMATS, diff_schemas, generate_schema, load_schema_artifact, render_schema, write_schema_artifact
+from ...settings import api_settings
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI document served by `api_docs_path` as precompressed, content-hashed files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            default=api_settings.SCHEMA_ARTIFACT_DIR,
+            help="Directory of the generated files, defaults to the `SCHEMA_ARTIFACT_DIR` setting.",
+        )
+        parser.add_argument("--urlconf", help="The URLconf to generate the document for, defaults to the served one.")
+        parser.add_argument("--format", choices=FORMATS, action="append", help="Formats to write, defaults to all.")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Don't write anything, exit non-zero if the existing files differ from the code.",
+        )
+
+    def handle(self, *args, output_dir, urlconf, format, check, **options):
+        if not output_dir:
+            raise CommandError("Set --output-dir or the SCHEMA_ARTIFACT_DIR setting")
+        output_dir = Path(output_dir)
+        schema = generate_schema(urlconf)
+
+        if check:
+            try:
+                committed = load_schema_artifact(output_dir)
+            except FileNotFoundError:
+                raise CommandError(f"No OpenAPI artifact in {output_dir}, run the command without --check")
+            differences = diff_schemas(committed, json.loads(render_schema(schema, "json")))
+            if differences:
+                self.stderr.write("\n".join(differences))
+                raise CommandError(f"The OpenAPI artifact in {output_dir} is out of date", returncode=1)
+            self.stdout.write("The OpenAPI artifact is up to date")
+            return
+
+        for path in write_schema_artifact(schema, output_dir, format or FORMATS):
+            self.stdout.write(f"Wrote {path} ({path.stat().st_size} bytes)")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyRecord",
+            fields=[
+                ("key", models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name="key")),
+                ("fingerprint", models.CharField(max_length=64, verbose_name="fingerprint")),
+                ("completed", models.BooleanField(default=False, verbose_name="completed")),
+                ("status_code", models.PositiveSmallIntegerField(null=True, verbose_name="status code")),
+                ("headers", models.JSONField(default=dict, verbose_name="headers")),
+                ("content", models.BinaryField(default=b"", verbose_name="content")),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="created")),
+            ],
+            options={
+                "verbose_name": "idempotency record",
+                "verbose_name_plural": "idempotency records",
+            },
+        ),
+    ]
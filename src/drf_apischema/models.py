@@ -0,0 +1,18 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class IdempotencyRecord(models.Model):
+    """The response stored for an `Idempotency-Key` by `DatabaseStore`."""
+
+    key = models.CharField(_("key"), max_length=64, primary_key=True)
+    fingerprint = models.CharField(_("fingerprint"), max_length=64)
+    completed = models.BooleanField(_("completed"), default=False)
+    status_code = models.PositiveSmallIntegerField(_("status code"), null=True)
+    headers = models.JSONField(_("headers"), default=dict)
+    content = models.BinaryField(_("content"), default=b"")
+    created = models.DateTimeField(_("created"), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _("idempotency record")
+        verbose_name_plural = _("idempotency records")
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+from rest_framework.relations import RelatedField
+
+
+@dataclass
+class QuerysetPlan:
+    """The relations to load along with the queryset to render a response serializer."""
+
+    select_related: list[str] = field(default_factory=list)
+    prefetch_related: list[str] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.select_related or self.prefetch_related)
+
+    def apply(self, queryset: models.QuerySet) -> models.QuerySet:
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset
+
+    def revert(self, queryset: models.QuerySet) -> models.QuerySet:
+        """Remove the relations of this plan from `queryset`, the other ones are kept."""
+        if self.prefetch_related:
+            prefetch = [i for i in queryset._prefetch_related_lookups if i not in self.prefetch_related]
+            queryset = queryset.prefetch_related(None).prefetch_related(*prefetch)
+        if self.select_related and isinstance(queryset.query.select_related, dict):
+            select = [i for i in _select_related_paths(queryset.query.select_related) if i not in self.select_related]
+            queryset = queryset.select_related(None)
+            if select:
+                queryset = queryset.select_related(*select)
+        return queryset
+
+
+def _select_related_paths(tree: dict, prefix: str = "") -> list[str]:
+    paths = []
+    for name, subtree in tree.items():
+        path = f"{prefix}{name}"
+        paths.extend(_select_related_paths(subtree, f"{path}__") if subtree else [path])
+    return paths
+
+
+@lru_cache(maxsize=1024)
+def build_plan(serializer_class: type[serializers.BaseSerializer], model: type[models.Model]) -> QuerysetPlan:
+    """
+    Analyze the fields of `serializer_class` rendering instances of `model`, following nested
+    serializers, related fields and dotted sources: to-one relations are `select_related` and
+    anything past a to-many relation is `prefetch_related`.
+    """
+    plan = QuerysetPlan()
+    _walk(serializer_class(), model, "", False, plan)
+    plan.select_related = _dedupe(plan.select_related)
+    plan.prefetch_related = _dedupe(plan.prefetch_related)
+    return plan
+
+
+def _walk(
+    serializer: serializers.BaseSerializer,
+    model: type[models.Model],
+    prefix: str,
+    many: bool,
+    plan: QuerysetPlan,
+):
+    for serializer_field in serializer.fields.values():  # type: ignore
+        if serializer_field.write_only:
+            continue
+        if serializer_field.source == "*":
+            if isinstance(serializer_field, serializers.BaseSerializer):
+                _walk(serializer_field, model, prefix, many, plan)
+            continue
+
+        current_model, path, field_many = model, prefix, many
+        for attr in serializer_field.source_attrs:
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                current_model = None
+                break
+            if not model_field.is_relation or model_field.related_model is None:
+                current_model = None
+                break
+            path = f"{path}__{attr}" if path else attr
+            field_many = field_many or bool(model_field.many_to_many or model_field.one_to_many)
+            current_model = model_field.related_model
+            (plan.prefetch_related if field_many else plan.select_related).append(path)
+
+        if current_model is None or path == prefix:
+            continue
+
+        if isinstance(serializer_field, serializers.ListSerializer):
+            _walk(serializer_field.child, current_model, path, True, plan)  # type: ignore
+        elif isinstance(serializer_field, serializers.BaseSerializer):
+            _walk(serializer_field, current_model, path, field_many, plan)
+        elif isinstance(serializer_field, RelatedField) and serializer_field.use_pk_only_optimization():
+            # The primary key is read from the foreign key column, the relation doesn't need to be loaded
+            if not field_many and plan.select_related[-1] == path:
+                plan.select_related.pop()
+
+
+def _dedupe(paths: list[str]) -> list[str]:
+    """Remove duplicates and paths that are covered by a longer one."""
+    unique = list(dict.fromkeys(paths))
+    return [i for i in unique if not any(j.startswith(f"{i}__") for j in unique)]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from functools import reduce
+from typing import Any, Sequence
+
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework.settings import api_settings as drf_api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetQuery(serializers.Serializer):
+    cursor = serializers.CharField(required=False, help_text=_("The cursor of the page to fetch."))
+    page_size = serializers.IntegerField(required=False, min_value=1, help_text=_("Number of results per page."))
+
+    def validate_cursor(self, value):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)))
+        except (ValueError, binascii.Error):
+            values = None
+        if not isinstance(values, list):
+            raise serializers.ValidationError(_("Invalid cursor."))
+        return values
+
+
+class Keyset:
+    """
+    Keyset (cursor) pagination, seeking from the last row of the previous page instead of
+    using OFFSET, and without counting the rows.
+
+    The view returns a queryset, which is ordered by `ordering`, filtered past the cursor and
+    serialized with the `response` serializer into `{"next": ..., "results": [...]}`.
+    `ordering` must only contain concrete, non-null fields of the model, the primary key is
+    appended as tie-breaker when it's not present.
+
+    :param ordering: The fields to order by, prefix with `-` for descending.
+    :param page_size: The default page size, defaults to DRF's `PAGE_SIZE`.
+    :param max_page_size: The maximum page size a client can ask for.
+    :param estimate_count: Add the estimated number of rows to the envelope as `count`.
+    """
+
+    query_serializer = KeysetQuery
+
+    def __init__(
+        self,
+        ordering: str | Sequence[str] = "-pk",
+        page_size: int | None = None,
+        max_page_size: int = 100,
+        estimate_count: bool = False,
+    ):
+        self.ordering = [ordering] if isinstance(ordering, str) else list(ordering)
+        self.page_size = page_size or drf_api_settings.PAGE_SIZE or 20
+        self.max_page_size = max_page_size
+        self.estimate_count = estimate_count
+
+    def get_query_serializer(self, query: Any = None) -> type[serializers.Serializer]:
+        """Merge the pagination query parameters into the `query` serializer of the endpoint."""
+        if query is None:
+            return self.query_serializer
+        query_cls = query if isinstance(query, type) else type(query)
+        return type(f"{query_cls.__name__}Keyset", (query_cls, self.query_serializer), {})
+
+    def get_response_serializer(self, response: Any) -> serializers.Serializer:
+        """The serializer of the pagination envelope, for the schema."""
+        item_cls = get_item_serializer_class(response)
+        fields: dict[str, Any] = {
+            "next": serializers.URLField(allow_null=True),
+            "results": item_cls(many=True),
+        }
+        if self.estimate_count:
+            fields["count"] = serializers.IntegerField(allow_null=True, help_text=_("Estimated number of results."))
+        return type(f"Paginated{item_cls.__name__}List", (serializers.Serializer,), fields)()
+
+    def get_ordering(self, model: type[models.Model]) -> list[str]:
+        ordering = list(self.ordering)
+        names = {i.lstrip("-") for i in ordering}
+        if "pk" not in names and model._meta.pk.name not in names:  # type: ignore
+            ordering.append("-pk" if ordering[0].startswith("-") else "pk")
+        return ordering
+
+    def get_page_size(self, validated_data: dict) -> int:
+        return min(validated_data.get("page_size") or self.page_size, self.max_page_size)
+
+    def encode_cursor(self, instance: models.Model, ordering: list[str]) -> str:
+        values = [getattr(instance, i.lstrip("-")) for i in ordering]
+        raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def seek(self, queryset: models.QuerySet, ordering: list[str], values: list) -> models.QuerySet:
+        if len(values) != len(ordering):
+            raise serializers.ValidationError({"cursor": [_("Invalid cursor.")]})
+        model = queryset.model
+        try:
+            values = [
+                model._meta.get_field(self._field_name(model, i)).to_python(v)  # type: ignore
+                for i, v in zip(ordering, values)
+            ]
+        except Exception:
+            raise serializers.ValidationError({"cursor": [_("Invalid cursor.")]})
+
+        conditions = []
+        for index, field in enumerate(ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            equals = {ordering[i].lstrip("-"): values[i] for i in range(index)}
+            conditions.append(Q(**equals, **{f"{field.lstrip('-')}__{lookup}": values[index]}))
+        return queryset.filter(reduce(lambda a, b: a | b, conditions))
+
+    def estimated_count(self, queryset: models.QuerySet) -> int | None:
+        """The planner's estimate of the number of rows, `None` if the database can't tell cheaply."""
+        if queryset.db and connections[queryset.db].vendor == "postgresql":
+            plan = json.loads(queryset.explain(format="json"))
+            return int(plan[0]["Plan"]["Plan Rows"])
+        return None
+
+    def paginate(self, queryset: models.QuerySet, request, serializer_class, context: dict | None = None) -> dict:
+        validated_data = getattr(request, "validated_query", None) or {}
+        ordering = self.get_ordering(queryset.model)
+        page_size = self.get_page_size(validated_data)
+
+        page_queryset = queryset.order_by(*ordering)
+        if validated_data.get("cursor") is not None:
+            page_queryset = self.seek(page_queryset, ordering, validated_data["cursor"])
+        rows = list(page_queryset[: page_size + 1])
+
+        next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", self.encode_cursor(rows[-1], ordering)
+            )
+
+        data: dict[str, Any] = {
+            "next": next_url,
+            "results": serializer_class(rows, many=True, context=context or {"request": request}).data,
+        }
+        if self.estimate_count:
+            data["count"] = self.estimated_count(queryset)
+        return data
+
+    @staticmethod
+    def _field_name(model: type[models.Model], name: str) -> str:
+        name = name.lstrip("-")
+        return model._meta.pk.name if name == "pk" else name  # type: ignore
+
+
+def get_item_serializer_class(response: Any) -> type[serializers.BaseSerializer]:
+    if isinstance(response, serializers.ListSerializer):
+        return type(response.child)
+    if isinstance(response, serializers.BaseSerializer):
+        return type(response)
+    return response
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http.response import HttpResponseBase
+from django.utils.module_loading import import_string
+
+from .settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+_profiling = threading.Lock()
+
+
+def is_profile_requested(request, view) -> bool:
+    """Whether the request asked for a profile with `PROFILE_HEADER` and has the `PROFILE_PERMISSIONS`."""
+    if not request.headers.get(api_settings.PROFILE_HEADER):
+        return False
+    for permission in api_settings.PROFILE_PERMISSIONS:
+        if isinstance(permission, str):
+            permission = import_string(permission)
+        if not permission().has_permission(request, view):
+            return False
+    return True
+
+
+def _is_sampled() -> bool:
+    rate = api_settings.PROFILE_SAMPLE_RATE
+    return bool(rate) and random.random() < rate
+
+
+class QueryTimeline:
+    """An `execute_wrapper` recording when each query of the request started and how long it took."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.queries: list[dict[str, Any]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            end = time.perf_counter()
+            self.queries.append(
+                {
+                    "alias": context["connection"].alias,
+                    "sql": sql,
+                    "start_ms": round((begin - self.start) * 1000, 3),
+                    "duration_ms": round((end - begin) * 1000, 3),
+                }
+            )
+
+    @property
+    def duration_ms(self) -> float:
+        return sum(i["duration_ms"] for i in self.queries)
+
+
+def _start_profiler(kind: str):
+    if kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImproperlyConfigured("`PROFILER = 'pyinstrument'` needs the `pyinstrument` package") from e
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    if kind != "cprofile":
+        raise ImproperlyConfigured(f"Unknown profiler {kind!r}, expected one of {PROFILERS}")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, path: Path) -> Path:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = path.with_suffix(".prof")
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = path.with_suffix(".html")
+        path.write_text(profiler.output_html())
+    return path
+
+
+def profile_request(request, view, handle: Callable[[], HttpResponseBase]) -> HttpResponseBase:
+    """
+    Run `handle` under the `PROFILER` if the request asked for it, see `is_profile_requested`,
+    or is sampled with `PROFILE_SAMPLE_RATE`. Only the former get the `Server-Timing` header.
+
+    Profilers and `tracemalloc` are process-wide, so one request is profiled at a time: the requests
+    arriving meanwhile, or when the profiler can't start, run unprofiled.
+    """
+    try:
+        requested = is_profile_requested(request, view)
+    except Exception:
+        logger.exception("Can't check whether to profile the request")
+        requested = False
+    if not (requested or _is_sampled()) or not _profiling.acquire(blocking=False):
+        return handle()
+    try:
+        return _profile(request, view, handle, server_timing=requested)
+    finally:
+        _profiling.release()
+
+
+def _profile(request, view, handle: Callable[[], HttpResponseBase], server_timing: bool) -> HttpResponseBase:
+    """
+    Run `handle` with the `tracemalloc` peak and the SQL timeline, write its profile and `<id>.json`.
+
+    The response gets the `Server-Timing` header if `server_timing` and `PROFILE_SERVER_TIMING`.
+    """
+    started_tracing = False
+    try:
+        output_dir = Path(api_settings.PROFILE_DIR)  # type: ignore
+        output_dir.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = _start_profiler(api_settings.PROFILER)
+    except Exception:
+        logger.exception("Can't start profiling, the request runs unprofiled")
+        if started_tracing:
+            tracemalloc.stop()
+        return handle()
+
+    start = time.perf_counter()
+    timeline = QueryTimeline(start)
+    response = None
+    saved = False
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timeline))
+            response = handle()
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        try:
+            profile_path = _stop_profiler(profiler, output_dir / profile_id)
+            _, peak = tracemalloc.get_traced_memory()
+            report = {
+                "id": profile_id,
+                "method": request.method,
+                "path": request.get_full_path(),
+                "view": type(view).__qualname__ if view is not None else None,
+                "status": getattr(response, "status_code", None),
+                "duration_ms": round(duration_ms, 3),
+                "memory_peak_bytes": peak,
+                "profile": profile_path.name,
+                "queries": timeline.queries,
+            }
+            (output_dir / f"{profile_id}.json").write_text(json.dumps(report, indent=2) + "\n")
+            saved = True
+        except Exception:
+            logger.exception("Can't save the profile of the request")
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+    if server_timing and api_settings.PROFILE_SERVER_TIMING and saved:
+        response["Server-Timing"] = (  # type: ignore
+            f"total;dur={duration_ms:.3f}, "
+            f'sql;dur={timeline.duration_ms:.3f};desc="{len(timeline.queries)} queries", '
+            f'profile;desc="{profile_id}"'
+        )
+    return response  # type: ignore
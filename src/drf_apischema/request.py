@@ -1,11 +1,18 @@
-from typing import Any, Generic, TypeVar
+from typing import Any, Callable, Generic, TypeVar
 
 from rest_framework import serializers
 from rest_framework.request import Request
 
+from .loaders import LoaderRegistry
+
 ST = TypeVar("ST", bound=serializers.BaseSerializer)
 
 
 class ASRequest(Request, Generic[ST]):
     serializer: ST
     validated_data: Any
+    validated_query: Any
+    """The validated data of the `query` serializer, also set when a `body` is declared"""
+    loaders: LoaderRegistry
+    defer: Callable[..., None]
+    """Run `fn(*args, **kwargs)` after the transaction commits, or after the response is produced"""
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_replica: ContextVar[str | None] = ContextVar("drf_apischema_replica", default=None)
+
+
+class ReadOnlyError(RuntimeError):
+    pass
+
+
+class ReadReplicaRouter:
+    """
+    Route the queries of read-only `apischema` endpoints to the replica.
+
+    Add it to `DATABASE_ROUTERS`, it doesn't route anything outside of these endpoints.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        alias = _replica.get()
+        if alias is not None and settings.DEBUG:
+            raise ReadOnlyError(f"Write to {model._meta.label} in a read-only endpoint routed to {alias!r}")
+        return None
+
+
+def get_replica() -> str | None:
+    """The database alias the reads of the current request are routed to, if any."""
+    return _replica.get()
+
+
+@contextmanager
+def use_replica(alias: str | None):
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
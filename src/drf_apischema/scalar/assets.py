@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from ..settings import api_settings
+
+DEFAULT_ASSETS_DIR = Path(__file__).parent / "static" / "drf_apischema" / "scalar"
+
+MANIFEST_NAME = "manifest.json"
+
+BUNDLE_NAME = "api-reference.js"
+
+
+def get_assets_dir() -> Path:
+    return Path(api_settings.SCALAR_ASSETS_DIR) if api_settings.SCALAR_ASSETS_DIR else DEFAULT_ASSETS_DIR
+
+
+@lru_cache(maxsize=None)
+def get_manifest(assets_dir: Path) -> dict[str, str]:
+    """The content-hashed file names of the vendored assets, by logical name."""
+    try:
+        return json.loads((assets_dir / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def get_vendored_bundle() -> str | None:
+    """The content-hashed file name of the vendored Scalar bundle, `None` if it isn't vendored."""
+    return get_manifest(get_assets_dir()).get(BUNDLE_NAME)
@@ -0,0 +1,47 @@
+import json
+import urllib.request
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ....artifacts import content_hash, write_precompressed
+from ...assets import BUNDLE_NAME, MANIFEST_NAME, get_assets_dir, get_manifest
+from ...views import JS_URL
+
+
+class Command(BaseCommand):
+    help = "Vendor the Scalar bundle as content-hashed static files, precompressed with gzip and brotli."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=JS_URL, help="URL or path of the Scalar bundle.")
+        parser.add_argument(
+            "--output-dir",
+            help="Directory of the vendored assets, defaults to `SCALAR_ASSETS_DIR` or the static files of the app.",
+        )
+
+    def handle(self, *args, source: str, output_dir: str | None, **options):
+        assets_dir = Path(output_dir) if output_dir else get_assets_dir()
+
+        try:
+            if source.startswith(("http://", "https://")):
+                with urllib.request.urlopen(source, timeout=60) as f:
+                    content = f.read()
+            else:
+                content = Path(source).read_bytes()
+        except OSError as e:
+            raise CommandError(f"Cannot read the Scalar bundle from {source}: {e}")
+
+        stem, suffix = BUNDLE_NAME.rsplit(".", 1)
+        for old in assets_dir.glob(f"{stem}.*.{suffix}*"):
+            old.unlink()
+        name = f"{stem}.{content_hash(content)}.{suffix}"
+        written = write_precompressed(assets_dir / name, content)
+
+        manifest_path = assets_dir / MANIFEST_NAME
+        manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+        manifest[BUNDLE_NAME] = name
+        manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+        get_manifest.cache_clear()
+
+        for path in written:
+            self.stdout.write(f"Wrote {path} ({path.stat().st_size} bytes)")
@@ -1,5 +1,15 @@
-from django.shortcuts import render
-from rest_framework.reverse import reverse
+from functools import lru_cache
+
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.urls import NoReverseMatch, get_script_prefix, reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from ..artifacts import IMMUTABLE_CACHE_CONTROL, serve_precompressed
+from .assets import get_assets_dir, get_manifest, get_vendored_bundle
 
 OPENAPI_URL = "schema"
 TITLE = "Scalar API Reference"
@@ -7,6 +17,47 @@ JS_URL = "https://cdn.jsdelivr.net/npm/@scalar/api-reference"
 PROXY_URL = ""
 FAVICON_URL = "/favicon.ico"
 
+CSRF_PLACEHOLDER = "<!--csrf-input-->"
+
+
+def get_scalar_js_url() -> str:
+    """The vendored bundle if there is one, else the CDN."""
+    bundle = get_vendored_bundle()
+    if bundle is None:
+        return JS_URL
+    try:
+        return reverse("scalar-asset", kwargs={"name": bundle})
+    except NoReverseMatch:
+        return static(f"drf_apischema/scalar/{bundle}")
+
+
+@lru_cache(maxsize=128)
+def render_scalar_viewer(
+    url_name: str,
+    title: str,
+    scalar_js_url: str | None,
+    scalar_proxy_url: str,
+    scalar_favicon_url: str,
+    host_url: str,
+    script_prefix: str,
+    tags_url_name: str | None = None,
+) -> str:
+    """
+    Render the viewer page once per (url_name, title, script host), with a placeholder for the CSRF input.
+
+    `script_prefix` is part of the key because `reverse()` depends on it.
+    """
+    context = {
+        "openapi_url": f"{host_url}{reverse(url_name)}",
+        "tags_url": f"{host_url}{reverse(tags_url_name)}" if tags_url_name else None,
+        "title": title,
+        "scalar_js_url": scalar_js_url if scalar_js_url is not None else get_scalar_js_url(),
+        "scalar_proxy_url": scalar_proxy_url,
+        "scalar_favicon_url": scalar_favicon_url,
+        "csrf_input": mark_safe(CSRF_PLACEHOLDER),
+    }
+    return render_to_string("drf_apischema/scalar.html", context)
+
 
 def scalar_viewer(
     request,
@@ -15,18 +66,25 @@ def scalar_viewer(
     scalar_js_url=None,
     scalar_proxy_url=None,
     scalar_favicon_url=None,
+    tags_url_name=None,
 ):
-    final_openapi_url = reverse(url_name if url_name is not None else OPENAPI_URL, request=request)
-    final_title = title if title is not None else TITLE
-    final_js_url = scalar_js_url if scalar_js_url is not None else JS_URL
-    final_proxy_url = scalar_proxy_url if scalar_proxy_url is not None else PROXY_URL
-    final_favicon_url = scalar_favicon_url if scalar_favicon_url is not None else FAVICON_URL
+    html = render_scalar_viewer(
+        url_name if url_name is not None else OPENAPI_URL,
+        title if title is not None else TITLE,
+        scalar_js_url,
+        scalar_proxy_url if scalar_proxy_url is not None else PROXY_URL,
+        scalar_favicon_url if scalar_favicon_url is not None else FAVICON_URL,
+        f"{request.scheme}://{request.get_host()}",
+        get_script_prefix(),
+        tags_url_name,
+    )
+    csrf_input = format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request))
+    return HttpResponse(html.replace(CSRF_PLACEHOLDER, csrf_input, 1))
 
-    context = {
-        "openapi_url": final_openapi_url,
-        "title": final_title,
-        "scalar_js_url": final_js_url,
-        "scalar_proxy_url": final_proxy_url,
-        "scalar_favicon_url": final_favicon_url,
-    }
-    return render(request, "drf_apischema/scalar.html", context)
+
+def scalar_asset(request, name):
+    """Serve a vendored, content-hashed asset, it never changes so it's cached for good."""
+    assets_dir = get_assets_dir()
+    if name not in get_manifest(assets_dir).values():
+        raise Http404
+    return serve_precompressed(request, assets_dir / name, cache_control=IMMUTABLE_CACHE_CONTROL)
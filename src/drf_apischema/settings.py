@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import TypeVar
+from typing import Sequence, TypeVar
 
 from django.conf import settings
 
@@ -27,6 +27,69 @@ class ApiSettings:
     OPENAPI_URL_NAME: str = "openapi.json"
     """OpenAPI URL name"""
 
+    OPTIMIZE_QUERYSET: bool = False
+    """`select_related`/`prefetch_related` the relations rendered by the response serializer in `view.get_queryset()`"""
+
+    DEFER_MAX_WORKERS: int = 4
+    """Threads running the work deferred with `request.defer()`, 0 runs it right after the response is produced"""
+
+    DEFER_MAX_QUEUE: int | None = 1000
+    """Deferred tasks waiting for a thread, the next ones run in the request thread, `None` for no limit"""
+
+    READ_REPLICA: str | None = None
+    """Database alias the read-only endpoints query, needs `ReadReplicaRouter` in `DATABASE_ROUTERS`"""
+
+    READ_REPLICA_METHODS: Sequence[str] = ()
+    """HTTP methods routed to `READ_REPLICA` when the endpoint doesn't set `read_only`, e.g. `("GET", "HEAD")`"""
+
+    SCHEMA_ARTIFACT_DIR: str | None = None
+    """Directory of the OpenAPI document written by `apischema_export`, served if set, needs `SERVE_PUBLIC`"""
+
+    SCALAR_ASSETS_DIR: str | None = None
+    """Directory of the vendored Scalar bundle, defaults to the static files of `drf_apischema.scalar`"""
+
+    CONCURRENCY_RETRY_AFTER: int = 1
+    """Seconds sent in the `Retry-After` header when an endpoint rejects a request over its `max_concurrency`"""
+
+    COALESCE_TIMEOUT: float | None = 30
+    """Seconds a coalesced request waits for the identical request in flight, before being rejected with 503"""
+
+    IDEMPOTENCY_HEADER: str = "Idempotency-Key"
+    """Request header of the idempotency key of `idempotent` endpoints"""
+
+    IDEMPOTENCY_STORE: str = "drf_apischema.idempotency.CacheStore"
+    """Where the responses of idempotent requests are stored, `CacheStore` or `DatabaseStore`"""
+
+    IDEMPOTENCY_CACHE: str = "default"
+    """Cache alias of `CacheStore`"""
+
+    IDEMPOTENCY_TTL: int = 24 * 60 * 60
+    """Seconds an idempotency key and its response are kept"""
+
+    IDEMPOTENCY_LOCK_TTL: int = 60
+    """Seconds a key stays claimed by the request in flight (e.g. if its worker died), above the slowest request"""
+
+    IDEMPOTENCY_WAIT: float = 0
+    """Seconds a retry waits for the request in flight with the same key, before being rejected with 409"""
+
+    PROFILE_DIR: str | None = None
+    """Directory the profiles of the requests are written to, profiling is disabled if not set"""
+
+    PROFILER: str = "cprofile"
+    """`cprofile` (deterministic) or `pyinstrument` (statistical, needs the `pyinstrument` package)"""
+
+    PROFILE_HEADER: str = "X-Profile"
+    """Request header asking for a profile, honored if the request passes `PROFILE_PERMISSIONS`"""
+
+    PROFILE_PERMISSIONS: Sequence[str | type] = ("rest_framework.permissions.IsAdminUser",)
+    """Permissions a request needs for `PROFILE_HEADER` to be honored"""
+
+    PROFILE_SAMPLE_RATE: float = 0.0
+    """Fraction of all the requests profiled, e.g. `0.001`"""
+
+    PROFILE_SERVER_TIMING: bool = True
+    """Add a `Server-Timing` header with the durations and the profile id to the responses profiled on request"""
+
 
 api_settings = ApiSettings(**getattr(settings, "DRF_APISCHEMA_SETTINGS", {}))
 
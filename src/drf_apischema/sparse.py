@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+FieldsTree = tuple[tuple[str, "FieldsTree"], ...]
+"""The selected fields by name, with the selected subfields of nested serializers, empty to select all"""
+
+
+def parse_fields(value: str) -> dict[str, dict]:
+    """Parse `id,groups.name,groups.id` into `{"id": {}, "groups": {"name": {}, "id": {}}}`."""
+    tree: dict[str, dict] = {}
+    for path in value.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        for name in path.split("."):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def _freeze(tree: dict[str, dict]) -> FieldsTree:
+    # Sorted so that the permutations of the same selection share the cached pruned classes
+    return tuple((name, _freeze(tree[name])) for name in sorted(tree))
+
+
+def _nested_serializer(field: serializers.Field) -> serializers.Serializer | None:
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child  # type: ignore
+    return field if isinstance(field, serializers.Serializer) else None
+
+
+def get_field_paths(serializer_class: type[serializers.Serializer], prefix: str = "") -> list[str]:
+    paths = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        paths.append(f"{prefix}{name}")
+        nested = _nested_serializer(field)
+        if nested is not None:
+            paths.extend(get_field_paths(type(nested), f"{prefix}{name}."))
+    return paths
+
+
+def _check_tree(serializer: serializers.Serializer, tree: dict[str, dict], prefix: str = ""):
+    fields = serializer.fields
+    for name, subtree in tree.items():
+        field = fields.get(name)
+        if field is None or field.write_only:
+            raise serializers.ValidationError(_("Unknown field: {}.").format(f"{prefix}{name}"))
+        if subtree:
+            nested = _nested_serializer(field)
+            if nested is None:
+                raise serializers.ValidationError(_("Field {} has no subfields.").format(f"{prefix}{name}"))
+            _check_tree(nested, subtree, f"{prefix}{name}.")
+
+
+class SparseFieldsQuery(serializers.Serializer):
+    response_serializer: type[serializers.Serializer]
+
+    fields = serializers.CharField(required=False)
+
+    def validate_fields(self, value) -> FieldsTree:
+        tree = parse_fields(value)
+        if not tree:
+            raise serializers.ValidationError(_("Select at least one field."))
+        _check_tree(self.response_serializer(), tree)
+        return _freeze(tree)
+
+
+def get_sparse_fields_query(response_serializer: type[serializers.Serializer], query: Any = None):
+    """The query serializer of the `fields` parameter for `response_serializer`, merged into the `query` serializer."""
+    paths = ", ".join(f"`{i}`" for i in get_field_paths(response_serializer))
+    fields = serializers.CharField(
+        required=False,
+        help_text=_(
+            "Comma separated fields to include in the response, nested fields are dotted. Available: {}"
+        ).format(paths),
+    )
+    bases: tuple[type, ...] = (SparseFieldsQuery,)
+    if query is not None:
+        bases = (query if isinstance(query, type) else type(query), *bases)
+    name = f"{bases[0].__name__}Fields" if query is not None else f"{response_serializer.__name__}Fields"
+    return type(name, bases, {"fields": fields, "response_serializer": response_serializer})
+
+
+@lru_cache(maxsize=1024)
+def prune_serializer_class(serializer_class: type[serializers.Serializer], tree: FieldsTree):
+    """
+    A subclass of `serializer_class` with only the fields in `tree`.
+
+    The declared fields are filtered and the `Meta.fields` of model serializers narrowed, so
+    building the fields of an instance only copies the selected ones.
+    """
+    selected = dict(tree)
+    declared = {}
+    for name, field in serializer_class._declared_fields.items():  # type: ignore
+        if name not in selected:
+            continue
+        if selected[name]:
+            field = _prune_nested(field, selected[name])
+        declared[name] = field
+
+    attrs: dict[str, Any] = {"__module__": serializer_class.__module__}
+    meta = getattr(serializer_class, "Meta", None)
+    if meta is not None and issubclass(serializer_class, serializers.ModelSerializer):
+        fields = tuple(name for name in serializer_class().fields if name in selected)
+        attrs["Meta"] = type("Meta", (meta,), {"fields": fields, "exclude": None})
+    pruned = type(serializer_class.__name__, (serializer_class,), attrs)
+    pruned._declared_fields = declared  # type: ignore
+    return pruned
+
+
+def _prune_nested(field: serializers.Field, tree: FieldsTree) -> serializers.Field:
+    if isinstance(field, serializers.ListSerializer):
+        child = _prune_nested(field.child, tree)  # type: ignore
+        return type(field)(*field._args, **{**field._kwargs, "child": child})  # type: ignore
+    pruned_class = prune_serializer_class(type(field), tree)  # type: ignore
+    return pruned_class(*field._args, **field._kwargs)  # type: ignore
+
+
+@lru_cache(maxsize=1024)
+def get_only_fields(
+    serializer_class: type[serializers.Serializer], model: type[models.Model]
+) -> tuple[str, ...] | None:
+    """
+    The model fields that `serializer_class` reads, for `.only()`, or `None` if it reads
+    anything else than fields and relations of the model (e.g. a method field or a property).
+    """
+    only = [model._meta.pk.name]  # type: ignore
+    for field in serializer_class().fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*" or not field.source_attrs:
+            return None
+        if field.source_attrs[0] == "pk":
+            continue
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if model_field.is_relation and not model_field.concrete:
+            # Reverse relations are loaded by their own queries from the primary key
+            continue
+        if getattr(model_field, "many_to_many", False):
+            continue
+        only.append(model_field.name)
+    return tuple(dict.fromkeys(only))
+
+
+def prune_data(data: Any, tree: FieldsTree) -> Any:
+    """Keep the selected fields of serialized `data`, for the views that don't render with the pruned serializer."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [prune_data(i, tree) for i in data]
+    if isinstance(data, dict):
+        selected = dict(tree)
+        return {name: prune_data(value, selected[name]) for name, value in data.items() if name in selected}
+    return data
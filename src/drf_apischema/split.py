@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+DEFAULT_TAG = "default"
+"""The tag of the operations without tags"""
+
+
+def get_operation_tags(schema: dict[str, Any]) -> list[str]:
+    """The tags of the operations, in the order of the `tags` of the document then of the paths."""
+    tags = [i["name"] for i in schema.get("tags", [])]
+    for item in schema.get("paths", {}).values():
+        for method, operation in item.items():
+            if method in HTTP_METHODS:
+                tags.extend(operation.get("tags") or [DEFAULT_TAG])
+    return list(dict.fromkeys(tags))
+
+
+def _collect_refs(value: Any, refs: set[str]):
+    if isinstance(value, dict):
+        ref = value.get("$ref")
+        if isinstance(ref, str):
+            refs.add(ref)
+        for i in value.values():
+            _collect_refs(i, refs)
+    elif isinstance(value, list):
+        for i in value:
+            _collect_refs(i, refs)
+
+
+def get_tag_document(schema: dict[str, Any], tag: str) -> dict[str, Any]:
+    """The sub-document of the operations tagged `tag`, with only the components they reference."""
+    paths = {}
+    for path, item in schema.get("paths", {}).items():
+        operations = {
+            method: operation
+            for method, operation in item.items()
+            if method in HTTP_METHODS and tag in (operation.get("tags") or [DEFAULT_TAG])
+        }
+        if operations:
+            paths[path] = {**{k: v for k, v in item.items() if k not in HTTP_METHODS}, **operations}
+
+    all_components = schema.get("components", {})
+    refs: set[str] = set()
+    pending: set[str] = set()
+    _collect_refs(paths, pending)
+    while pending:
+        ref = pending.pop()
+        if ref in refs or not ref.startswith("#/components/"):
+            continue
+        refs.add(ref)
+        _, _, section, name = ref.split("/", 3)
+        _collect_refs(all_components.get(section, {}).get(name), pending)
+
+    components = {}
+    for section, items in all_components.items():
+        if section == "securitySchemes":
+            # Referenced by name from `security`, not by `$ref`
+            selected = items
+        else:
+            selected = {name: item for name, item in items.items() if f"#/components/{section}/{name}" in refs}
+        if selected:
+            components[section] = selected
+
+    document = {k: v for k, v in schema.items() if k not in ("paths", "components", "tags")}
+    document["paths"] = paths
+    tag_objects = [i for i in schema.get("tags", []) if i.get("name") == tag]
+    if tag_objects:
+        document["tags"] = tag_objects
+    if components:
+        document["components"] = components
+    return document
+
+
+def split_by_tag(schema: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    return {tag: get_tag_document(schema, tag) for tag in get_operation_tags(schema)}
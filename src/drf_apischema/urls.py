@@ -1,22 +1,51 @@
 from __future__ import annotations
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import URLPattern, URLResolver, include, path
+from drf_spectacular.settings import spectacular_settings
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
-from .scalar.views import scalar_viewer
+from .scalar.views import scalar_asset, scalar_viewer
 from .settings import api_settings
+from .views import SchemaArtifactView, SchemaTagDocumentView, SchemaTagIndexView
 
 
 def api_docs_path(
     prefix: str = "api-docs/",
     extra_urlpatterns: list[URLPattern | URLResolver] | None = None,
     openapi_url_name: str | None = None,
+    split_by_tag: bool = False,
 ):
+    """
+    :param prefix: The prefix of the documentation routes.
+    :param extra_urlpatterns: Additional routes under the prefix.
+    :param openapi_url_name: The URL name of the OpenAPI document.
+    :param split_by_tag: Whether to serve the sub-documents by tag, the Scalar page loads them on demand
+        instead of the whole document.
+    """
     openapi_url_name = openapi_url_name or api_settings.OPENAPI_URL_NAME
+    tags_url_name = f"{openapi_url_name}-tags"
+    tag_url_name = f"{openapi_url_name}-tag"
+
+    if api_settings.SCHEMA_ARTIFACT_DIR:
+        if not spectacular_settings.SERVE_PUBLIC:
+            # The artifact is generated without a request, it would show every endpoint to every user
+            raise ImproperlyConfigured("`SCHEMA_ARTIFACT_DIR` can't be served unless drf-spectacular `SERVE_PUBLIC`")
+        schema_path = path(
+            f"{openapi_url_name}/",
+            SchemaArtifactView.as_view(),
+            name=openapi_url_name,
+            kwargs={"artifact_dir": api_settings.SCHEMA_ARTIFACT_DIR},
+        )
+    else:
+        schema_path = path(f"{openapi_url_name}/", SpectacularAPIView.as_view(), name=openapi_url_name)
+
+    scalar_kwargs = {"url_name": openapi_url_name, "tags_url_name": tags_url_name if split_by_tag else None}
 
     docs_urlpatterns: list[URLPattern | URLResolver] = [
-        path(f"{openapi_url_name}/", SpectacularAPIView.as_view(), name=openapi_url_name),
-        path("scalar/", scalar_viewer, name="scalar", kwargs={"url_name": openapi_url_name}),
+        schema_path,
+        path("scalar/", scalar_viewer, name="scalar", kwargs=scalar_kwargs),
+        path("scalar/assets/<str:name>", scalar_asset, name="scalar-asset"),
         path(
             "swagger-ui/",
             SpectacularSwaggerView.as_view(url_name=openapi_url_name),
@@ -24,6 +53,16 @@ def api_docs_path(
         ),
         path("redoc/", SpectacularRedocView.as_view(url_name=openapi_url_name), name="redoc"),
     ]
+    if split_by_tag:
+        docs_urlpatterns += [
+            path(
+                f"{openapi_url_name}/tags/",
+                SchemaTagIndexView.as_view(),
+                name=tags_url_name,
+                kwargs={"url_name": tag_url_name},
+            ),
+            path(f"{openapi_url_name}/tags/<path:tag>/", SchemaTagDocumentView.as_view(), name=tag_url_name),
+        ]
     if extra_urlpatterns is not None:
         docs_urlpatterns.extend(extra_urlpatterns)
 
@@ -9,12 +9,18 @@ from rest_framework import status as S
 
 
 class HttpError(Exception):
-    def __init__(self, content: dict | str | Any = "", status: int = S.HTTP_400_BAD_REQUEST):
+    def __init__(
+        self,
+        content: dict | str | Any = "",
+        status: int = S.HTTP_400_BAD_REQUEST,
+        headers: dict[str, str] | None = None,
+    ):
         if isinstance(content, dict):
             self.content = content
         else:
             self.content = {"detail": content}
         self.status = status
+        self.headers = headers
 
 
 class DetailError(HttpError):
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.urls import reverse
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import AUTHENTICATION_CLASSES
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.views import APIView
+
+from .artifacts import content_hash, etag_matches, serve_precompressed
+from .export import generate_schema, load_manifest, render_schema
+from .settings import api_settings
+from .split import split_by_tag
+
+MEDIA_TYPES = {
+    "json": "application/vnd.oai.openapi+json",
+    "yaml": "application/vnd.oai.openapi",
+}
+
+
+def _get_format(request, files: dict) -> str:
+    format = request.GET.get("format")
+    if format in files:
+        return format
+    if "json" in request.headers.get("accept", "") or "yaml" not in files:
+        return "json"
+    return "yaml"
+
+
+class _IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """The views serve the formats they pick themselves, only the errors go through the renderers."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class SchemaView(APIView):
+    """Served with the permissions and the authentication of `SpectacularAPIView`."""
+
+    permission_classes = spectacular_settings.SERVE_PERMISSIONS
+    authentication_classes = AUTHENTICATION_CLASSES
+    content_negotiation_class = _IgnoreClientContentNegotiation
+
+
+class SchemaArtifactView(SchemaView):
+    """Serve the OpenAPI document written by the `apischema_export` command, nothing is generated at runtime."""
+
+    @extend_schema(exclude=True)
+    def get(self, request, artifact_dir: str):
+        artifact_dir_path = Path(artifact_dir)
+        files = load_manifest(artifact_dir_path)["files"]
+        format = _get_format(request, files)
+        return serve_precompressed(
+            request,
+            artifact_dir_path / files[format]["name"],
+            content_type=MEDIA_TYPES[format],
+            etag=files[format]["hash"],
+            cache_control="no-cache",
+        )
+
+
+class TagDocuments:
+    """The sub-documents of the OpenAPI document by tag, each rendered on its first request."""
+
+    def __init__(self, request):
+        self.documents = split_by_tag(json.loads(render_schema(generate_schema(request=request), "json")))
+        self.rendered: dict[str, tuple[bytes, str]] = {}
+
+    def render(self, tag: str) -> tuple[bytes, str]:
+        if tag not in self.rendered:
+            try:
+                document = self.documents[tag]
+            except KeyError:
+                raise Http404
+            content = render_schema(document, "json")
+            self.rendered[tag] = content, content_hash(content)
+        return self.rendered[tag]
+
+
+_shared_tag_documents: TagDocuments | None = None
+
+
+def get_tag_documents(request) -> TagDocuments:
+    """The sub-documents `request` can see, generated once and shared if the document is public."""
+    global _shared_tag_documents
+    if not spectacular_settings.SERVE_PUBLIC:
+        # Filtered by the permissions of the request, it can't be shared
+        return TagDocuments(request)
+    if _shared_tag_documents is None or settings.DEBUG:
+        _shared_tag_documents = TagDocuments(request)
+    return _shared_tag_documents
+
+
+class SchemaTagIndexView(SchemaView):
+    """The index of the sub-documents of the OpenAPI document by tag."""
+
+    @extend_schema(exclude=True)
+    def get(self, request, url_name: str):
+        if api_settings.SCHEMA_ARTIFACT_DIR:
+            names = list(load_manifest(Path(api_settings.SCHEMA_ARTIFACT_DIR))["tags"])
+        else:
+            names = list(get_tag_documents(request).documents)
+        tags = [
+            {"name": tag, "url": request.build_absolute_uri(reverse(url_name, kwargs={"tag": tag}))} for tag in names
+        ]
+        response = JsonResponse({"tags": tags})
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+class SchemaTagDocumentView(SchemaView):
+    """The sub-document of the operations tagged `tag`, with only the components they reference."""
+
+    @extend_schema(exclude=True)
+    def get(self, request, tag: str):
+        if api_settings.SCHEMA_ARTIFACT_DIR:
+            artifact_dir = Path(api_settings.SCHEMA_ARTIFACT_DIR)
+            file = load_manifest(artifact_dir)["tags"].get(tag)
+            if file is None:
+                raise Http404
+            return serve_precompressed(
+                request,
+                artifact_dir / file["name"],
+                content_type=MEDIA_TYPES["json"],
+                etag=file["hash"],
+                cache_control="no-cache",
+            )
+
+        content, hash = get_tag_documents(request).render(tag)
+        etag = f'"{hash}"'
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=MEDIA_TYPES["json"])
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return response